@@ -0,0 +1,22 @@
+"""Add document ingestion claim
+
+Revision ID: add_document_claimed_at
+Revises: add_document_content_hash
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_document_claimed_at'
+down_revision = 'add_document_content_hash'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Renewed by the server process handling a pending document
+    op.add_column('documents', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+
+def downgrade():
+    op.drop_column('documents', 'claimed_at')
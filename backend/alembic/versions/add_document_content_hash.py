@@ -0,0 +1,24 @@
+"""Add document content hash
+
+Revision ID: add_document_content_hash
+Revises: add_document_status
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_document_content_hash'
+down_revision = 'add_document_status'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # sha256 of the stored file, used to spot re-uploads of the same content
+    op.add_column('documents', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'])
+
+def downgrade():
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+    op.drop_column('documents', 'content_hash')
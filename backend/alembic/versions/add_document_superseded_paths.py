@@ -0,0 +1,22 @@
+"""Add stored files of superseded document versions
+
+Revision ID: add_document_superseded_paths
+Revises: add_document_claimed_at
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_document_superseded_paths'
+down_revision = 'add_document_claimed_at'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Earlier versions' files, removed once the job indexing their replacement has run
+    op.add_column('documents', sa.Column('superseded_paths', sa.Text(), nullable=True))
+
+def downgrade():
+    op.drop_column('documents', 'superseded_paths')
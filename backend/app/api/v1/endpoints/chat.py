@@ -6,6 +6,7 @@ from app.core.database import get_db
 from app.models.chat import ChatMessage
 from app.schemas.chat import ChatMessageCreate, ChatMessageResponse
 from app.services.enhanced_rag_service import EnhancedRAGService
+from app.dependencies.services import get_rag_service
 from app.core.logger import logger
 from typing import List, Optional
 import json
@@ -16,14 +17,13 @@ router = APIRouter()
 @router.post("/stream")
 async def stream_chat(
     message: ChatMessageCreate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
     async def generate_stream():
         try:
             logger.info(f"Starting streaming chat for message: {message.user_message[:100]}...")
             # Use enhanced RAG service with streaming
-            rag_service = EnhancedRAGService()
-            
             async for chunk in rag_service.stream_response(message.user_message, top_k=5):
                 yield f"data: {json.dumps(chunk)}\n\n"
             
@@ -41,13 +41,13 @@ async def stream_chat(
 @router.post("/messages", response_model=ChatMessageResponse)
 async def create_chat_message(
     message: ChatMessageCreate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
     try:
         logger.info(f"Processing chat message: {message.user_message[:100]}...")
         # Use enhanced RAG service
-        rag_service = EnhancedRAGService()
-        result = rag_service.generate_response(message.user_message, top_k=5)
+        result = await rag_service.generate_response(message.user_message, top_k=5)
         response = result["answer"]
         logger.info("Chat message processed successfully")
         
@@ -1,49 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.services.document_service import DocumentService
+from app.services.enhanced_rag_service import EnhancedRAGService
+from app.services.ingestion_queue import IngestionQueue, IngestionQueueFull
+from app.dependencies.services import get_rag_service, get_ingestion_queue
 from app.schemas.document import DocumentCreate, DocumentResponse, DocumentContentResponse
 from app.schemas.processing_status import ProcessingStatus
-from typing import List
+from typing import List, Optional, Tuple
 
 router = APIRouter()
 
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single "bytes=" range, or None to send the whole file"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        # Multiple ranges are rare for previews; a full response is a valid answer
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if first and last and end < start:
+        # A last byte before the first makes the range invalid, and an invalid Range is ignored
+        return None
+    end = min(end, size - 1)
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
     uploaded_by: str = Form("Anonymous"),
-    db: AsyncSession = Depends(get_db)
+    force_reprocess: bool = Form(False),
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
-    content = await file.read()
+    # The upload is already spooled to disk (or memory when small); it is
+    # streamed from there into storage rather than read into one bytes object
     document_create = DocumentCreate(
         filename=file.filename,
         uploader_id=uploaded_by,
-        file_size=len(content)
+        file_size=file.size
     )
     
-    service = DocumentService(db)
-    document = await service.upload_document(content, document_create)
+    service = DocumentService(db, rag_service, ingestion_queue)
+    try:
+        await file.seek(0)
+        document = await service.upload_document(file.file, document_create, force_reprocess=force_reprocess)
+    except IngestionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return document
+
+@router.put("/{document_id}", response_model=DocumentResponse)
+async def update_document(
+    document_id: int,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue)
+):
+    """Upload a new version of a document; unchanged chunks are not re-embedded"""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    service = DocumentService(db, rag_service, ingestion_queue)
+    try:
+        await file.seek(0)
+        document = await service.update_document(document_id, file.file, file.filename)
+    except IngestionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
     return document
 
 @router.get("/", response_model=List[DocumentResponse])
 async def get_documents(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
-    service = DocumentService(db)
+    service = DocumentService(db, rag_service)
     documents = await service.get_documents(skip=skip, limit=limit)
     return documents
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
-    service = DocumentService(db)
+    service = DocumentService(db, rag_service)
     document = await service.get_document(document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -52,34 +117,76 @@ async def get_document(
 @router.get("/{document_id}/content", response_model=DocumentContentResponse)
 async def get_document_content(
     document_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
-    service = DocumentService(db)
-    content_response = await service.get_document_content(document_id)
-    if not content_response:
+    """Extracted text of a document, optionally a window of limit characters from offset"""
+    service = DocumentService(db, rag_service)
+    document = await service.get_document(document_id)
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Only text saved at ingestion is versioned by the content hash; text
+    # extracted from the file on the fly is not revalidated
+    text_path = await service.find_extracted_text(document)
+    etag = service.content_etag(document, offset, limit) if text_path else None
+    if etag and _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    try:
+        content_response = await service.read_document_content(document, offset, limit, text_path)
+    except Exception as e:
+        # Reported in the body, without an ETag
+        return service.content_error(document, e)
+    if etag:
+        response.headers.update({"ETag": etag, "Cache-Control": "no-cache"})
     return content_response
 
 @router.get("/{document_id}/preview")
 async def preview_document(
     document_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
-    from fastapi.responses import Response
-    service = DocumentService(db)
+    """Stream the stored file without buffering it; single byte-range requests get a 206"""
+    service = DocumentService(db, rag_service)
     file_data = await service.get_document_file(document_id)
     if not file_data:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    content, content_type = file_data
-    return Response(content=content, media_type=content_type)
+    file_path, content_type, file_size = file_data
+    byte_range = _parse_range(request.headers.get("range"), file_size)
+    headers = {"Accept-Ranges": "bytes"}
+    if byte_range is None:
+        local_path = service.storage.local_path(file_path)
+        if local_path:
+            # Served from disk by the server, with sendfile where it is supported
+            return FileResponse(local_path, media_type=content_type, headers=headers)
+        headers["Content-Length"] = str(file_size)
+        return StreamingResponse(service.storage.iter_file(file_path), media_type=content_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        service.storage.iter_file(file_path, start, end - start + 1),
+        status_code=206,
+        media_type=content_type,
+        headers=headers
+    )
 
 @router.get("/{document_id}/status", response_model=ProcessingStatus)
 async def get_document_status(
     document_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ):
-    service = DocumentService(db)
+    service = DocumentService(db, rag_service)
     document = await service.get_document(document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -96,10 +203,16 @@ async def get_document_status(
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
-    service = DocumentService(db)
-    success = await service.delete_document(document_id)
+    service = DocumentService(db, rag_service, ingestion_queue)
+    try:
+        # Deleting a document other documents share vectors with queues a re-index
+        success = await service.delete_document(document_id)
+    except IngestionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     if not success:
         raise HTTPException(status_code=404, detail="Document not found")
     return {"message": "Document deleted successfully"}
\ No newline at end of file
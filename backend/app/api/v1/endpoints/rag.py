@@ -1,33 +1,58 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.services.enhanced_rag_service import EnhancedRAGService
-from typing import Dict, Any, List
+from app.dependencies.services import get_rag_service
+from app.schemas.rag import BatchSearchRequest, BatchSearchResponse
+from typing import Dict, Any, List, Optional
 
 router = APIRouter()
 
 @router.get("/stats")
-async def get_rag_stats(db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+async def get_rag_stats(
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
+) -> Dict[str, Any]:
     """Get RAG service statistics"""
-    rag_service = EnhancedRAGService()
     return rag_service.get_stats()
 
+@router.post("/stats/recompute")
+async def recompute_rag_stats(
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
+) -> Dict[str, Any]:
+    """Rebuild vector store counters from the collection and report any drift"""
+    return await asyncio.to_thread(rag_service.vector_service.recompute_stats)
+
 @router.post("/search")
 async def search_documents(
     query: str,
     top_k: int = 5,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ) -> List[Dict[str, Any]]:
     """Search for relevant documents"""
-    rag_service = EnhancedRAGService()
-    return rag_service.search_documents(query, top_k)
+    # Embedding and the vector query are blocking; keep them off the event loop
+    return await asyncio.to_thread(rag_service.search_documents, query, top_k)
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(
+    request: BatchSearchRequest,
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
+) -> BatchSearchResponse:
+    """Search for many queries in one request; results are returned in query order"""
+    results = await asyncio.to_thread(
+        rag_service.search_documents_batch, request.queries, request.top_k, request.metadata_filter
+    )
+    return BatchSearchResponse(results=results)
 
 @router.post("/generate")
 async def generate_response(
     query: str,
     top_k: int = 5,
-    db: AsyncSession = Depends(get_db)
+    rerank_budget_ms: Optional[float] = None,
+    db: AsyncSession = Depends(get_db),
+    rag_service: EnhancedRAGService = Depends(get_rag_service)
 ) -> Dict[str, Any]:
     """Generate RAG response with citations"""
-    rag_service = EnhancedRAGService()
-    return rag_service.generate_response(query, top_k)
\ No newline at end of file
+    return await rag_service.generate_response(query, top_k, rerank_budget_ms=rerank_budget_ms)
\ No newline at end of file
@@ -0,0 +1,15 @@
+from fastapi import Request
+from app.services.enhanced_rag_service import EnhancedRAGService
+from app.services.ingestion_queue import IngestionQueue
+from app.services.service_container import ServiceContainer, get_service_container
+
+def get_services(request: Request) -> ServiceContainer:
+    # The lifespan stores the container on app.state; fall back to the
+    # process-wide instance when the app is driven without its lifespan.
+    return getattr(request.app.state, "services", None) or get_service_container()
+
+def get_rag_service(request: Request) -> EnhancedRAGService:
+    return get_services(request).get_rag_service()
+
+def get_ingestion_queue(request: Request) -> IngestionQueue:
+    return get_services(request).get_ingestion_queue()
@@ -1,12 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services.service_container import get_service_container
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build shared RAG services once so requests reuse warm clients
+    services = get_service_container()
+    await services.start_workers()
+    app.state.services = services
+    try:
+        yield
+    finally:
+        await services.shutdown()
 
 app = FastAPI(
     title="AIDEMO Backend",
     description="FastAPI RAG Backend with LLM Integration",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
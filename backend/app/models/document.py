@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Enum
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Enum, Text
 from sqlalchemy.sql import func
 from app.core.database import Base
 from app.schemas.processing_status import ProcessingStage
@@ -13,12 +13,19 @@ class Document(Base):
     uploader_id = Column(String, nullable=True)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     storage_type = Column(String, default="local")
+    # Id of the document whose vectors this one shares when it was uploaded as a duplicate
     vector_collection_id = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
     status = Column(Enum(ProcessingStage, values_callable=lambda obj: [e.value for e in obj]), 
                    default=ProcessingStage.UPLOADING.value)
     processing_progress = Column(Integer, default=0)
     processing_message = Column(String, default="Starting upload...")
     processing_error = Column(String, nullable=True)
+    # Renewed by the process handling the document; lapsed claims are re-queued
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    # Stored files of earlier versions, one per line, removed once the job
+    # indexing their replacement has run; kept here so a restart does not leak them
+    superseded_paths = Column(Text, nullable=True)
     
     # Properties for frontend compatibility
     @property
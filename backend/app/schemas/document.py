@@ -19,6 +19,7 @@ class DocumentResponse(BaseModel):
     file_path: str
     storage_type: str
     vector_collection_id: Optional[str] = None
+    content_hash: Optional[str] = None
     
     @classmethod
     def from_db_model(cls, document):
@@ -31,7 +32,8 @@ class DocumentResponse(BaseModel):
             upload_date=document.uploaded_at.isoformat(),
             file_path=document.file_path,
             storage_type=document.storage_type,
-            vector_collection_id=document.vector_collection_id
+            vector_collection_id=document.vector_collection_id,
+            content_hash=document.content_hash
         )
     
     class Config:
@@ -40,6 +42,10 @@ class DocumentResponse(BaseModel):
 class DocumentContentResponse(BaseModel):
     content: str
     metadata: dict
+    # Character window of the extracted text returned in content
+    offset: int = 0
+    total_length: Optional[int] = None
+    has_more: bool = False
     
     class Config:
         from_attributes = True
\ No newline at end of file
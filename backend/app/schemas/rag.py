@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(5, ge=1, le=100)
+    metadata_filter: Optional[Dict[str, Any]] = None
+
+class BatchSearchResponse(BaseModel):
+    results: List[List[Dict[str, Any]]]
@@ -0,0 +1,147 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """Rough token count; close enough for budgeting without a model tokenizer"""
+    return max(1, int(len(text) / chars_per_token + 0.5)) if text else 0
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _overlap(left: str, right: str, max_chars: int) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    for size in range(min(len(left), len(right), max_chars), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+class ContextPacker:
+    """Turns retrieved chunks into the passages that go into the prompt.
+
+    Consecutive chunks of the same document are merged with their shared
+    overlap removed, near-duplicate passages are dropped, and passages are
+    added in retrieval order until the model's token budget is filled.
+    """
+
+    def __init__(self, token_budget: int, chars_per_token: float = 4.0,
+                 duplicate_threshold: float = 0.9, max_overlap_chars: int = 1000):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.duplicate_threshold = duplicate_threshold
+        self.max_overlap_chars = max_overlap_chars
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self._lock = threading.Lock()
+
+    def pack(self, results: List[Dict[str, Any]], token_budget: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Return (passages, report); passages are shaped like search results"""
+        budget = token_budget or self.token_budget
+        tokens_in = sum(estimate_tokens(r["text"], self.chars_per_token) for r in results)
+
+        passages = self._merge_adjacent(results)
+        merged = len(results) - len(passages)
+        passages, duplicates = self._drop_duplicates(passages)
+
+        packed = []
+        used = 0
+        truncated = 0
+        for passage in passages:
+            tokens = estimate_tokens(passage["text"], self.chars_per_token)
+            remaining = budget - used
+            if tokens > remaining:
+                # A partial passage is still worth sending if a useful amount fits
+                if remaining < min(64, budget // 4):
+                    break
+                passage["text"] = passage["text"][:int(remaining * self.chars_per_token)]
+                tokens = remaining
+                truncated += 1
+            passage["rank"] = len(packed) + 1
+            packed.append(passage)
+            used += tokens
+
+        report = {
+            "chunks": len(results),
+            "passages": len(packed),
+            "merged": merged,
+            "duplicates_dropped": duplicates,
+            "truncated": truncated,
+            "omitted": len(passages) - len(packed),
+            "tokens_in": tokens_in,
+            "tokens_out": used,
+            "tokens_saved": tokens_in - used,
+            "token_budget": budget
+        }
+        with self._lock:
+            self.requests += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += used
+        return packed, report
+
+    def _merge_adjacent(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge runs of consecutive chunk_ids within a document, keeping retrieval order"""
+        by_key = {}
+        for position, result in enumerate(results):
+            by_key[(result.get("document_id"), result.get("chunk_id"))] = position
+
+        passages = []
+        consumed = set()
+        for position, result in enumerate(results):
+            if position in consumed:
+                continue
+            if result.get("chunk_id") is None:
+                passages.append(self._passage(result, [result]))
+                continue
+            document_id = result.get("document_id")
+            # Extend the run backwards and forwards through retrieved neighbours
+            start = result["chunk_id"]
+            while (document_id, start - 1) in by_key and by_key[(document_id, start - 1)] not in consumed:
+                start -= 1
+            run = []
+            chunk_id = start
+            while (document_id, chunk_id) in by_key and by_key[(document_id, chunk_id)] not in consumed:
+                run.append(results[by_key[(document_id, chunk_id)]])
+                consumed.add(by_key[(document_id, chunk_id)])
+                chunk_id += 1
+            passages.append(self._passage(result, run))
+        return passages
+
+    def _passage(self, best: Dict[str, Any], run: List[Dict[str, Any]]) -> Dict[str, Any]:
+        text = run[0]["text"]
+        for chunk in run[1:]:
+            overlap = _overlap(text, chunk["text"], self.max_overlap_chars)
+            text += chunk["text"][overlap:] if overlap else "\n" + chunk["text"]
+        passage = dict(best)
+        passage["text"] = text
+        passage["chunk_id"] = run[0].get("chunk_id")
+        passage["chunk_ids"] = [chunk.get("chunk_id") for chunk in run]
+        passage["distance"] = min(chunk["distance"] for chunk in run)
+        return passage
+
+    def _drop_duplicates(self, passages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        kept, kept_shingles = [], []
+        for passage in passages:
+            shingles = _shingles(passage["text"])
+            if any(_jaccard(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(passage)
+            kept_shingles.append(shingles)
+        return kept, len(passages) - len(kept)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+            "token_budget": self.token_budget
+        }
@@ -1,75 +1,160 @@
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Iterator, Optional, Tuple
+from langchain_core.documents import Document as LangchainDocument
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.document_loaders import TextLoader
 from langchain_community.document_loaders import Docx2txtLoader
+from pypdf import PdfReader
 import numpy as np
 import pickle
+import hashlib
 import os
+from functools import lru_cache
 from pathlib import Path
 from app.utils.embedding_utils import get_embeddings
 
+def build_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+def chunk_hash(text: str) -> str:
+    """Content hash identifying a chunk across versions of a document"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+@lru_cache(maxsize=2)
+def _cached_pdf_reader(file_path: str, mtime_ns: int, size: int) -> PdfReader:
+    return PdfReader(file_path)
+
+def open_pdf(file_path: str) -> PdfReader:
+    """PdfReader for file_path, shared by the calls in this process.
+
+    Ingestion reads a PDF one page window per call, each in a pool worker;
+    without the cache every window re-parses the whole file. The key includes
+    the file's mtime and size so a replaced file is read again.
+    """
+    stat = os.stat(file_path)
+    return _cached_pdf_reader(file_path, stat.st_mtime_ns, stat.st_size)
+
+def count_pages(file_path: str) -> int:
+    """Number of loadable units: pages for PDFs, 1 for everything else"""
+    if Path(file_path).suffix.lower() == '.pdf':
+        return len(open_pdf(file_path).pages)
+    return 1
+
+def load_document(file_path: str, start_page: int = 0, end_page: Optional[int] = None) -> List[Any]:
+    """Load document based on file type.
+
+    For PDFs only pages [start_page, end_page) are extracted, so large files
+    can be processed a window at a time.
+    """
+    file_ext = Path(file_path).suffix.lower()
+
+    if file_ext == '.pdf':
+        reader = open_pdf(file_path)
+        end_page = len(reader.pages) if end_page is None else min(end_page, len(reader.pages))
+        return [
+            LangchainDocument(
+                page_content=reader.pages[page].extract_text() or "",
+                metadata={"source": file_path, "page": page}
+            )
+            for page in range(start_page, end_page)
+        ]
+    elif file_ext == '.txt':
+        loader = TextLoader(file_path)
+    elif file_ext in ['.docx', '.doc']:
+        loader = Docx2txtLoader(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+    # Non-paged formats are a single unit
+    return loader.load() if start_page == 0 else []
+
+def load_and_chunk(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200,
+                   start_page: int = 0, end_page: Optional[int] = None) -> List[Any]:
+    """Load and split a document, or one page window of it.
+
+    Kept at module level and free of embedding clients so the CPU-bound
+    parsing can run in a worker process.
+    """
+    documents = load_document(file_path, start_page, end_page)
+    return build_splitter(chunk_size, chunk_overlap).split_documents(documents)
+
+def load_chunk_and_extract(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200,
+                           start_page: int = 0, end_page: Optional[int] = None) -> Tuple[List[Any], str]:
+    """load_and_chunk that also returns the window's extracted text, each page followed by a line break"""
+    documents = load_document(file_path, start_page, end_page)
+    chunks = build_splitter(chunk_size, chunk_overlap).split_documents(documents)
+    return chunks, "".join(document.page_content + "\n" for document in documents)
+
 class DocumentProcessor:
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.embedding_model = get_embeddings()
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-    
+        self.splitter = build_splitter(chunk_size, chunk_overlap)
+
     def load_document(self, file_path: str) -> List[Any]:
         """Load document based on file type"""
-        file_ext = Path(file_path).suffix.lower()
-        
-        if file_ext == '.pdf':
-            loader = PyPDFLoader(file_path)
-        elif file_ext == '.txt':
-            loader = TextLoader(file_path)
-        elif file_ext in ['.docx', '.doc']:
-            loader = Docx2txtLoader(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-        
-        return loader.load()
-    
+        return load_document(file_path)
+
     def chunk_documents(self, documents: List[Any]) -> List[Any]:
         """Split documents into chunks"""
         chunks = self.splitter.split_documents(documents)
         return chunks
-    
-    def embed_chunks(self, chunks: List[Any]) -> List[List[float]]:
+
+    def embed_chunks(self, chunks: List[Any]) -> np.ndarray:
         """Generate embeddings for chunks"""
         texts = [chunk.page_content for chunk in chunks]
-        # OllamaEmbeddings.embed_documents returns List[List[float]]
+        # Batched, concurrent embedding; returns a float32 (n_chunks, dim) array
         embeddings = self.embedding_model.embed_documents(texts)
         return embeddings
-    
-    def process_document(self, file_path: str, document_id: int) -> Dict[str, Any]:
-        """Complete document processing pipeline"""
-        # Load document
-        documents = self.load_document(file_path)
-        
-        # Chunk documents
-        chunks = self.chunk_documents(documents)
-        
+
+    def iter_chunk_batches(self, file_path: str, pages_per_batch: int) -> Iterator[Tuple[List[Any], int, int]]:
+        """Yield (chunks, pages_done, total_pages) one page window at a time.
+
+        Only one window of pages is held in memory, however large the file.
+        """
+        total_pages = count_pages(file_path)
+        for start in range(0, total_pages, pages_per_batch):
+            end = min(start + pages_per_batch, total_pages)
+            yield self.chunk_documents(load_document(file_path, start, end)), end, total_pages
+
+    def prepare_chunks(self, chunks: List[Any], document_id: int, source: str, first_chunk_id: int = 0,
+                       chunk_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Embed already split chunks and build their vector metadata.
+
+        chunk_ids gives each chunk's position explicitly, for when only some
+        chunks of a document are being added.
+        """
         # Generate embeddings
         embeddings = self.embed_chunks(chunks)
-        
+
         # Prepare metadata
         metadata = []
         for i, chunk in enumerate(chunks):
             metadata.append({
                 "text": chunk.page_content,
                 "document_id": document_id,
-                "chunk_id": i,
-                "source": file_path
+                "chunk_id": chunk_ids[i] if chunk_ids is not None else first_chunk_id + i,
+                "chunk_hash": chunk_hash(chunk.page_content),
+                "source": source
             })
-        
+
         return {
             "embeddings": embeddings,
             "metadata": metadata,
             "chunk_count": len(chunks)
-        }
\ No newline at end of file
+        }
+
+    def process_document(self, file_path: str, document_id: int) -> Dict[str, Any]:
+        """Complete document processing pipeline"""
+        # Load document
+        documents = self.load_document(file_path)
+
+        # Chunk documents
+        chunks = self.chunk_documents(documents)
+
+        return self.prepare_chunks(chunks, document_id, file_path)
@@ -1,101 +1,185 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import or_, select
 from app.models.document import Document
 from app.schemas.document import DocumentCreate, DocumentContentResponse, DocumentResponse
 from app.schemas.processing_status import ProcessingStage
-from app.utils.storage import get_storage_service
+from app.utils.storage import HashingReader, extracted_text_path, get_storage_service
 from app.utils.file_utils import extract_text_content
 from app.services.enhanced_rag_service import EnhancedRAGService
+from app.services.ingestion_queue import IngestionQueue, QueueSlot, utcnow
+from app.services.service_container import get_service_container
 from app.core.logger import logger
-import uuid
-import os
 import asyncio
-from typing import List, Optional
+import codecs
+import hashlib
+import uuid
+import zlib
+from contextlib import nullcontext
+from typing import BinaryIO, List, Optional, Tuple
 
 class DocumentService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, rag_service: EnhancedRAGService = None, ingestion_queue: IngestionQueue = None):
         self.db = db
         self.storage = get_storage_service()
-        self.rag_service = EnhancedRAGService()
+        self.rag_service = rag_service or get_service_container().get_rag_service()
+        self.ingestion_queue = ingestion_queue or get_service_container().get_ingestion_queue()
     
-    async def upload_document(self, file_content: bytes, document: DocumentCreate) -> DocumentResponse:
-        # Generate unique file path
-        file_id = str(uuid.uuid4())
-        file_path = f"{file_id}_{document.filename}"
-        
-        # Store file
-        await self.storage.store_file(file_path, file_content)
-        
-        # Save to database first to get document ID
-        db_document = Document(
-            filename=document.filename,
-            file_path=file_path,
-            file_size=document.file_size or len(file_content),
-            uploader_id=document.uploader_id,
-            storage_type=self.storage.storage_type,
-            status=ProcessingStage.UPLOADING.value,
-            processing_progress=0,
-            processing_message="Upload completed, starting processing..."
-        )
-        self.db.add(db_document)
-        await self.db.commit()
-        await self.db.refresh(db_document)
-        
-        # Process document for RAG with proper transaction handling
-        try:
-            # Update status to processing
-            db_document.status = ProcessingStage.PROCESSING.value
-            db_document.processing_progress = 25
-            db_document.processing_message = "Processing document..."
-            await self.db.commit()
-            
-            # Save file temporarily for processing
-            temp_path = f"workspace/temp/{file_path}"
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            with open(temp_path, "wb") as f:
-                f.write(file_content)
-            
-            logger.info(f"Starting RAG processing for document {db_document.id}")
+    async def _store(self, file_path: str, fileobj: BinaryIO) -> HashingReader:
+        """Stream fileobj into storage, hashing it on the way; returns the reader with its size and sha256"""
+        reader = HashingReader(fileobj)
+        await self.storage.store_fileobj(file_path, reader)
+        logger.info(f"Stored {file_path} ({reader.size} bytes, sha256 {reader.sha256})")
+        return reader
+    
+    async def upload_document(self, fileobj: BinaryIO, document: DocumentCreate, force_reprocess: bool = False) -> DocumentResponse:
+        # Hold a place in the queue before storing, so a stored document can
+        # always be queued; refuses early when the queue is full
+        with self.ingestion_queue.reserve() as slot:
+            # Generate unique file path
+            file_id = str(uuid.uuid4())
+            file_path = f"{file_id}_{document.filename}"
             
-            # Update status to embedding
-            db_document.status = ProcessingStage.EMBEDDING.value
-            db_document.processing_progress = 75
-            db_document.processing_message = "Generating embeddings..."
-            await self.db.commit()
+            # Store file
+            stored = await self._store(file_path, fileobj)
             
-            # Run blocking RAG processing in a separate thread
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(
-                None,
-                self.rag_service.process_document,
-                temp_path,
-                db_document.id
+            # Save to database first to get document ID
+            db_document = Document(
+                filename=document.filename,
+                file_path=file_path,
+                file_size=stored.size,
+                uploader_id=document.uploader_id,
+                storage_type=self.storage.storage_type,
+                content_hash=stored.sha256,
+                status=ProcessingStage.UPLOADING.value,
+                processing_progress=0,
+                processing_message="Upload completed, waiting for processing...",
+                claimed_at=utcnow()
             )
             
-            # Clean up temp file
-            os.remove(temp_path)
+            original = None if force_reprocess else await self._find_processed(stored.sha256)
+            if original:
+                # Same content is already indexed: share its vectors instead of
+                # parsing and embedding the file again. The file is still kept so
+                # the document can be previewed and re-indexed on its own later.
+                owner_id = self._vector_owner_id(original)
+                db_document.vector_collection_id = str(owner_id)
+                db_document.status = ProcessingStage.COMPLETED.value
+                db_document.processing_progress = 100
+                db_document.processing_message = f"Duplicate of document {original.id}, reusing its index"
+                db_document.claimed_at = None
             
-            # Update status to completed
-            db_document.status = ProcessingStage.COMPLETED.value
-            db_document.processing_progress = 100
-            db_document.processing_message = "Document processed successfully"
+            self.db.add(db_document)
             await self.db.commit()
+            await self.db.refresh(db_document)
             
-            logger.info(f"RAG processing completed for document {db_document.id}")
+            if original:
+                logger.info(f"Document {db_document.id} duplicates document {original.id}, sharing vectors of {owner_id}")
+                return DocumentResponse.from_db_model(db_document)
             
-        except Exception as e:
-            logger.error(f"RAG processing failed for document {db_document.id}: {e}")
-            # Update status to error but keep document in database
-            try:
-                db_document.status = ProcessingStage.ERROR.value
-                db_document.processing_error = str(e)
-                db_document.processing_message = "Processing failed"
-                await self.db.commit()
-            except Exception as commit_error:
-                logger.error(f"Failed to update error status for document {db_document.id}: {commit_error}")
+            # Parsing and embedding happen in the background; clients poll /status
+            slot.enqueue(db_document.id, file_path)
 
         return DocumentResponse.from_db_model(db_document)
     
+    async def update_document(self, document_id: int, fileobj: BinaryIO, filename: str) -> Optional[DocumentResponse]:
+        """Replace a document with a new version, re-indexing only the chunks that changed"""
+        db_document = await self.get_document(document_id)
+        if not db_document:
+            return None
+        
+        # A duplicate has no vectors of its own to diff against, and vectors
+        # other documents share must not change under them
+        incremental = db_document.vector_collection_id is None
+        duplicates = await self._documents_sharing(document_id, exclude_id=document_id) if incremental else []
+        # A duplicate whose owner is gone may be the last document searching its vectors
+        owner_id = self._vector_owner_id(db_document)
+        orphaned = not incremental and not await self._documents_sharing(owner_id, exclude_id=document_id)
+        
+        # Places for this document and for the duplicate taking over its
+        # vectors are reserved before anything is stored
+        with self.ingestion_queue.reserve() as slot, \
+                (self.ingestion_queue.reserve() if duplicates else nullcontext()) as successor_slot:
+            old_file_path = db_document.file_path
+            file_path = f"{uuid.uuid4()}_{filename}"
+            stored = await self._store(file_path, fileobj)
+            
+            if duplicates:
+                await self._hand_over_vectors(db_document, duplicates, successor_slot)
+            db_document.vector_collection_id = None
+            
+            db_document.filename = filename
+            db_document.file_path = file_path
+            db_document.file_size = stored.size
+            db_document.storage_type = self.storage.storage_type
+            db_document.content_hash = stored.sha256
+            db_document.status = ProcessingStage.UPLOADING.value
+            db_document.processing_progress = 0
+            db_document.processing_message = "Update uploaded, waiting for processing..."
+            db_document.processing_error = None
+            db_document.claimed_at = utcnow()
+            # Recorded with the update, so a job rebuilt after a restart still removes it
+            db_document.superseded_paths = "\n".join(filter(None, [db_document.superseded_paths, old_file_path]))
+            await self.db.commit()
+            await self.db.refresh(db_document)
+            if orphaned:
+                self._delete_vectors(owner_id)
+            
+            # A job already queued or running for this document may still read
+            # the old file; the new job removes it once it has run
+            slot.enqueue(document_id, file_path, incremental=incremental, replaces=[old_file_path])
+        
+        return DocumentResponse.from_db_model(db_document)
+    
+    @staticmethod
+    def _vector_owner_id(document: Document) -> int:
+        """Id the document's chunks are indexed under: its own, or the one it duplicates"""
+        return int(document.vector_collection_id) if document.vector_collection_id else document.id
+    
+    async def _find_processed(self, content_hash: str) -> Optional[Document]:
+        """The oldest successfully indexed document with this content, if any"""
+        result = await self.db.execute(
+            select(Document)
+            .where(Document.content_hash == content_hash, Document.status == ProcessingStage.COMPLETED.value)
+            .order_by(Document.id)
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    async def _documents_sharing(self, owner_id: int, exclude_id: int) -> List[Document]:
+        """Documents other than exclude_id whose search results come from owner_id's vectors"""
+        result = await self.db.execute(
+            select(Document)
+            .where(
+                or_(Document.id == owner_id, Document.vector_collection_id == str(owner_id)),
+                Document.id != exclude_id
+            )
+            .order_by(Document.id)
+        )
+        return list(result.scalars().all())
+    
+    async def _hand_over_vectors(self, document: Document, duplicates: List[Document], slot: QueueSlot):
+        """Before a document's vectors are rewritten, re-index the oldest duplicate
+        from its own copy of the file and point the other duplicates at it"""
+        successor, others = duplicates[0], duplicates[1:]
+        successor.vector_collection_id = None
+        successor.status = ProcessingStage.UPLOADING.value
+        successor.processing_progress = 0
+        successor.processing_message = f"Re-indexing, document {document.id} was replaced"
+        successor.claimed_at = utcnow()
+        for duplicate in others:
+            duplicate.vector_collection_id = str(successor.id)
+        await self.db.commit()
+        logger.info(f"Document {successor.id} takes over the vectors of document {document.id}")
+        slot.enqueue(successor.id, successor.file_path)
+    
+    def _delete_vectors(self, owner_id: int):
+        try:
+            # Delete from RAG vector store
+            logger.info(f"Deleting document {owner_id} from RAG vector store")
+            self.rag_service.delete_document(owner_id)
+        except Exception as e:
+            logger.error(f"Failed to delete document {owner_id} from vector store: {e}")
+    
     async def get_documents(self, skip: int = 0, limit: int = 100) -> List[DocumentResponse]:
         result = await self.db.execute(
             select(Document).offset(skip).limit(limit)
@@ -109,68 +193,157 @@ class DocumentService:
         )
         return result.scalar_one_or_none()
     
-    async def get_document_content(self, document_id: int) -> Optional[DocumentContentResponse]:
+    @staticmethod
+    def content_etag(document: Document, offset: int = 0, limit: Optional[int] = None) -> str:
+        """ETag of a window of the text saved at ingestion, known without reading storage"""
+        version = document.content_hash or f"{document.file_path}:{document.file_size}"
+        tag = hashlib.sha256(f"extracted:{version}:{document.filename}:{offset}:{limit}".encode()).hexdigest()[:32]
+        return f'"{tag}"'
+    
+    async def find_extracted_text(self, document: Document) -> Optional[str]:
+        """Storage path of the text saved by ingestion for this document, or None"""
+        sources = [document.file_path]
+        if document.vector_collection_id:
+            # Duplicates skip ingestion; the document they share vectors with has the text
+            owner = await self.get_document(int(document.vector_collection_id))
+            if owner and owner.content_hash == document.content_hash:
+                sources.append(owner.file_path)
+        
+        for file_path in sources:
+            try:
+                await self.storage.get_size(extracted_text_path(file_path))
+            except FileNotFoundError:
+                continue
+            return extracted_text_path(file_path)
+        return None
+    
+    async def _read_text_window(self, text_path: str, offset: int, limit: Optional[int]) -> Tuple[str, Optional[int], bool]:
+        """(content, total_length, has_more) for a window of saved text.
+        
+        The gzip file is decompressed as it streams in and the download stops
+        one character past the window, so total_length is only known when the
+        window reaches the end of the text.
+        """
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        end = None if limit is None else offset + limit
+        parts = []
+        seen = 0
+        chunks = self.storage.iter_file(text_path)
+        try:
+            async for compressed in chunks:
+                text = await asyncio.to_thread(lambda: decoder.decode(decompressor.decompress(compressed)))
+                if seen + len(text) > offset:
+                    parts.append(text[max(offset - seen, 0):None if end is None else end - seen])
+                seen += len(text)
+                if end is not None and seen > end:
+                    return "".join(parts), None, True
+        finally:
+            await chunks.aclose()
+        
+        if not decompressor.eof:
+            raise EOFError(f"Extracted text {text_path} is truncated")
+        text = decoder.decode(decompressor.flush(), final=True)
+        parts.append(text[max(offset - seen, 0):None if end is None else max(end - seen, 0)])
+        seen += len(text)
+        return "".join(parts), seen, end is not None and end < seen
+    
+    @staticmethod
+    def _content_metadata(document: Document) -> dict:
+        return {
+            "name": document.filename,
+            "file_size": document.file_size,
+            "file_type": document.filename.split('.')[-1].upper() if '.' in document.filename else 'UNKNOWN',
+            "upload_date": document.uploaded_at.isoformat()
+        }
+    
+    def content_error(self, document: Document, error: Exception) -> DocumentContentResponse:
+        """Response reporting that the document's text could not be read"""
+        return DocumentContentResponse(
+            content=f"Error reading document content: {str(error)}",
+            metadata=self._content_metadata(document)
+        )
+    
+    async def get_document_content(self, document_id: int, offset: int = 0, limit: Optional[int] = None) -> Optional[DocumentContentResponse]:
         document = await self.get_document(document_id)
         if not document:
             return None
-        
         try:
-            # Get file content from storage
+            return await self.read_document_content(document, offset, limit, await self.find_extracted_text(document))
+        except Exception as e:
+            return self.content_error(document, e)
+    
+    async def read_document_content(self, document: Document, offset: int = 0, limit: Optional[int] = None,
+                                    text_path: Optional[str] = None) -> DocumentContentResponse:
+        """limit characters of the document's text from offset; the whole text when limit is None.
+        
+        text_path is the saved text from find_extracted_text; without it the
+        text is extracted from the stored file. Read errors are raised.
+        """
+        if text_path:
+            content, total_length, has_more = await self._read_text_window(text_path, offset, limit)
+        else:
+            # Documents indexed before the text was saved
+            logger.info(f"No extracted text stored for document {document.id}, extracting it from the file")
             file_content = await self.storage.get_file(document.file_path)
-            
-            # Extract text content
             text_content = await extract_text_content(file_content, document.filename)
-            
-            return DocumentContentResponse(
-                content=text_content,
-                metadata={
-                    "name": document.filename,
-                    "file_size": document.file_size,
-                    "file_type": document.filename.split('.')[-1].upper() if '.' in document.filename else 'UNKNOWN',
-                    "upload_date": document.uploaded_at.isoformat()
-                }
-            )
-        except Exception as e:
-            return DocumentContentResponse(
-                content=f"Error reading document content: {str(e)}",
-                metadata={
-                    "name": document.filename,
-                    "file_size": document.file_size,
-                    "file_type": document.filename.split('.')[-1].upper() if '.' in document.filename else 'UNKNOWN',
-                    "upload_date": document.uploaded_at.isoformat()
-                }
-            )
+            end = len(text_content) if limit is None else min(offset + limit, len(text_content))
+            content, total_length, has_more = text_content[offset:end], len(text_content), end < len(text_content)
+        
+        return DocumentContentResponse(
+            content=content,
+            metadata=self._content_metadata(document),
+            offset=offset,
+            total_length=total_length,
+            has_more=has_more
+        )
     
     async def delete_document(self, document_id: int) -> bool:
         document = await self.get_document(document_id)
         if not document:
             return False
         
-        try:
-            # Delete from storage
-            await self.storage.delete_file(document.file_path)
-        except Exception:
-            pass  # Continue even if file deletion fails
-        
-        try:
-            # Delete from RAG vector store
-            logger.info(f"Deleting document {document_id} from RAG vector store")
-            self.rag_service.delete_document(document_id)
-        except Exception as e:
-            logger.error(f"Failed to delete document {document_id} from vector store: {e}")
-        
-        # Delete from database
-        await self.db.delete(document)
-        await self.db.commit()
+        owner_id = self._vector_owner_id(document)
+        sharing = await self._documents_sharing(owner_id, exclude_id=document_id)
+        # An owner with duplicates hands its vectors over before it goes, so
+        # they are not left behind under an id no document has; the place for
+        # the successor's re-index is reserved before anything is deleted
+        hand_over = bool(sharing) and owner_id == document.id
+        with (self.ingestion_queue.reserve() if hand_over else nullcontext()) as slot:
+            # Jobs still queued or running for it stop before adding more vectors
+            self.ingestion_queue.cancel(document_id)
+            try:
+                # Delete from storage, with earlier versions not removed yet
+                superseded = document.superseded_paths.split("\n") if document.superseded_paths else []
+                for file_path in [document.file_path, *superseded]:
+                    await self.storage.delete_file(file_path)
+                    await self.storage.delete_file(extracted_text_path(file_path))
+            except Exception:
+                pass  # Continue even if file deletion fails
+            
+            if hand_over:
+                await self._hand_over_vectors(document, sharing, slot)
+            
+            # Delete from database before the vectors: a job in another process
+            # sees the row gone at its next status update and cleans up after itself
+            await self.db.delete(document)
+            await self.db.commit()
+            
+            if sharing and not hand_over:
+                # The owner and other duplicates still search these vectors
+                logger.info(f"Keeping vectors of document {owner_id}, shared by {len(sharing)} other documents")
+            else:
+                self._delete_vectors(owner_id)
         return True
     
-    async def get_document_file(self, document_id: int):
+    async def get_document_file(self, document_id: int) -> Optional[Tuple[str, str, int]]:
+        """(storage path, content type, size) of a document's stored file, or None; the file itself is not read"""
         document = await self.get_document(document_id)
         if not document:
             return None
         
         try:
-            file_content = await self.storage.get_file(document.file_path)
+            file_size = await self.storage.get_size(document.file_path)
             
             # Determine content type based on file extension
             file_ext = document.filename.lower().split('.')[-1]
@@ -186,7 +359,7 @@ class DocumentService:
             }
             
             content_type = content_type_map.get(file_ext, 'application/octet-stream')
-            return file_content, content_type
+            return document.file_path, content_type, file_size
         except FileNotFoundError:
             print(f"File not found: {document.file_path}")
             return None
@@ -1,29 +1,86 @@
 import os
 import asyncio
+import copy
 import requests
+import httpx
 import json
-from typing import List, Dict, Any, AsyncGenerator
+import time
+import numpy as np
+from typing import List, Dict, Any, AsyncGenerator, Callable, Optional
 # from langchain_community.llms import Ollama # Removed due to stability issues
 from app.services.amazon_q_service import AmazonQService
 from app.services.vector_service import VectorService
-from app.services.document_processor import DocumentProcessor
+from app.services.document_processor import DocumentProcessor, chunk_hash
+from app.services.query_cache import TTLCache, normalize_query, filter_key
+from app.services.semantic_cache import SemanticCache
+from app.services.reranker import CrossEncoderReranker
+from app.services.context_packer import ContextPacker
 from app.core.logger import logger
 from app.core.config import settings
 
+ANSWER_PROMPT_TEMPLATE = """You are a helpful AI assistant. Answer the question based ONLY on the following provided context.
+If the answer is not in the context, say "I cannot answer this based on the provided documents."
+Do not use outside knowledge.
+
+Context:
+{context}
+
+Question: {query}
+
+Answer:"""
+
+STREAM_PROMPT_TEMPLATE = """You are a helpful AI assistant. Answer the question based ONLY on the following provided context.
+If the answer is not in the context, say "I cannot answer this based on the provided documents."
+Include reference numbers [1], [2], etc. when citing specific information.
+
+Context:
+{context}
+
+Question: {query}
+
+Answer:"""
+
 class SimpleOllama:
-    def __init__(self, base_url: str, model: str):
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        timeout: float = None,
+        connect_timeout: float = None,
+        max_connections: int = None,
+        max_keepalive_connections: int = None,
+        max_concurrency: int = None
+    ):
         self.base_url = base_url
         self.model = model
+        timeout = timeout or settings.ollama_timeout_seconds
+        connect_timeout = connect_timeout or settings.ollama_connect_timeout_seconds
+        # Pooled keep-alive connections: a session for sync callers and an
+        # async client for request handlers running on the event loop.
+        self._session = requests.Session()
+        self._timeout = (connect_timeout, timeout)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections or settings.ollama_max_connections,
+                max_keepalive_connections=max_keepalive_connections or settings.ollama_max_keepalive_connections
+            )
+        )
+        # Caps in-flight generations so a burst cannot overload Ollama
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings.ollama_max_concurrency)
 
-    def invoke(self, prompt: str) -> str:
-        url = f"{self.base_url}/api/generate"
-        data = {
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "prompt": prompt,
-            "stream": False
+            "stream": stream
         }
+
+    def invoke(self, prompt: str) -> str:
+        url = f"{self.base_url}/api/generate"
         try:
-            response = requests.post(url, json=data)
+            response = self._session.post(url, json=self._payload(prompt, False), timeout=self._timeout)
             response.raise_for_status()
             return response.json().get("response", "")
         except Exception as e:
@@ -32,88 +89,333 @@ class SimpleOllama:
 
     def stream(self, prompt: str):
         url = f"{self.base_url}/api/generate"
-        data = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": True
-        }
         try:
-            response = requests.post(url, json=data, stream=True)
-            response.raise_for_status()
-            for line in response.iter_lines():
-                if line:
-                    body = json.loads(line)
-                    response_part = body.get("response", "")
-                    if response_part:
-                        yield response_part
-                    if body.get("done", False):
-                        break
+            with self._session.post(url, json=self._payload(prompt, True), stream=True, timeout=self._timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        body = json.loads(line)
+                        response_part = body.get("response", "")
+                        if response_part:
+                            yield response_part
+                        if body.get("done", False):
+                            break
         except Exception as e:
             logger.error(f"SimpleOllama stream failed: {e}")
             raise
 
+    async def ainvoke(self, prompt: str) -> str:
+        try:
+            async with self._semaphore:
+                response = await self._client.post("/api/generate", json=self._payload(prompt, False))
+                response.raise_for_status()
+                return response.json().get("response", "")
+        except Exception as e:
+            logger.error(f"SimpleOllama ainvoke failed: {e}")
+            raise
+
+    async def astream(self, prompt: str) -> AsyncGenerator[str, None]:
+        try:
+            async with self._semaphore:
+                async with self._client.stream("POST", "/api/generate", json=self._payload(prompt, True)) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line:
+                            body = json.loads(line)
+                            response_part = body.get("response", "")
+                            if response_part:
+                                yield response_part
+                            if body.get("done", False):
+                                break
+        except Exception as e:
+            logger.error(f"SimpleOllama astream failed: {e}")
+            raise
+
+    async def aclose(self):
+        await self._client.aclose()
+        self._session.close()
+
+def build_llm():
+    """Create the configured LLM client.
+
+    Prefer Amazon Bedrock (Amazon Q) if enabled; otherwise use local Ollama.
+    """
+    if settings.aws_bedrock_enabled and settings.aws_bedrock_model:
+        try:
+            llm = AmazonQService(region=settings.aws_region, model_id=settings.aws_bedrock_model)
+            logger.info(f"Amazon Bedrock LLM initialized: {settings.aws_bedrock_model}")
+            return llm
+        except Exception as e:
+            logger.error(f"Failed to initialize Amazon Bedrock LLM: {e}")
+            raise
+    try:
+        llm = SimpleOllama(
+            model=settings.local_llm_model,
+            base_url=settings.ollama_base_url
+        )
+        logger.info(f"Local LLM initialized (SimpleOllama): {settings.local_llm_model}")
+        return llm
+    except Exception as e:
+        logger.error(f"Failed to initialize local LLM: {e}")
+        raise
+
 class EnhancedRAGService:
-    def __init__(self):
-        self.vector_service = VectorService()
-        self.document_processor = DocumentProcessor()
+    def __init__(self, vector_service: VectorService = None, document_processor: DocumentProcessor = None, llm=None):
+        # Components are normally injected by the app-scoped ServiceContainer;
+        # building them here is kept for standalone use.
+        self.vector_service = vector_service or VectorService()
+        self.document_processor = document_processor or DocumentProcessor()
+        self.llm = llm or build_llm()
         
-        # Prefer Amazon Bedrock (Amazon Q) if enabled; otherwise use local Ollama
-        self.llm = None
-        if settings.aws_bedrock_enabled and settings.aws_bedrock_model:
-            try:
-                self.llm = AmazonQService(region=settings.aws_region, model_id=settings.aws_bedrock_model)
-                logger.info(f"Amazon Bedrock LLM initialized: {settings.aws_bedrock_model}")
-            except Exception as e:
-                logger.error(f"Failed to initialize Amazon Bedrock LLM: {e}")
-                raise
-        else:
-            try:
-                self.llm = SimpleOllama(
-                    model=settings.local_llm_model,
-                    base_url="http://localhost:11434"
-                )
-                logger.info(f"Local LLM initialized (SimpleOllama): {settings.local_llm_model}")
-            except Exception as e:
-                logger.error(f"Failed to initialize local LLM: {e}")
-                raise
+        # Retrieval results and generated answers; keys include the index
+        # version and both caches are cleared whenever vectors change
+        self.retrieval_cache = None
+        self.answer_cache = None
+        if settings.query_cache_enabled:
+            self.retrieval_cache = TTLCache(settings.retrieval_cache_max_entries, settings.retrieval_cache_ttl_seconds)
+            self.answer_cache = TTLCache(settings.answer_cache_max_entries, settings.answer_cache_ttl_seconds)
+            self.vector_service.add_change_listener(self.clear_caches)
+        
+        # Opt-in: replays answers for paraphrased queries
+        self.semantic_cache = None
+        if settings.semantic_cache_enabled:
+            self.semantic_cache = SemanticCache(
+                threshold=settings.semantic_cache_threshold,
+                max_entries=settings.semantic_cache_max_entries,
+                ttl_seconds=settings.semantic_cache_ttl_seconds
+            )
+            self.vector_service.add_change_listener(self.semantic_cache.clear)
+        
+        # Opt-in: over-fetches candidates and reorders them with a cross-encoder
+        self.reranker = None
+        if settings.reranker_enabled:
+            self.reranker = CrossEncoderReranker(
+                model_name=settings.reranker_model,
+                batch_size=settings.reranker_batch_size
+            )
+        
+        # Opt-in: merges neighbouring chunks, drops duplicates and enforces the token budget
+        self.context_packer = None
+        if settings.context_packing_enabled:
+            self.context_packer = ContextPacker(
+                token_budget=settings.context_token_budget,
+                chars_per_token=settings.context_chars_per_token,
+                duplicate_threshold=settings.context_duplicate_threshold
+            )
+    
+    @property
+    def model_name(self) -> str:
+        return getattr(self.llm, "model", None) or getattr(self.llm, "model_id", None) or type(self.llm).__name__
+    
+    def clear_caches(self):
+        """Drop cached retrieval results and answers"""
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.clear()
+            self.answer_cache.clear()
     
-    def process_document(self, file_path: str, document_id: int) -> Dict[str, Any]:
-        """Process document and add to vector store"""
+    async def _embed_query(self, query: str) -> np.ndarray:
+        # Goes through the embedding cache, so the search that follows a
+        # semantic cache miss does not embed the query again
+        embeddings = await asyncio.to_thread(self.vector_service.embedding_function.embed_texts, [query])
+        return embeddings[0]
+    
+    def process_document(self, file_path: str, document_id: int,
+                         progress_callback: Callable[[int, int], None] = None) -> Dict[str, Any]:
+        """Process document and add to vector store one page window at a time"""
         logger.info(f"Processing document {document_id}: {file_path}")
         
         try:
-            result = self.document_processor.process_document(file_path, document_id)
+            chunk_count = 0
+            for chunks, pages_done, total_pages in self.document_processor.iter_chunk_batches(
+                file_path, settings.ingestion_pages_per_batch
+            ):
+                self.add_chunks(chunks, document_id, file_path, first_chunk_id=chunk_count)
+                chunk_count += len(chunks)
+                if progress_callback:
+                    progress_callback(pages_done, total_pages)
             
-            self.vector_service.add_document_vectors(
-                result["embeddings"],
-                result["metadata"]
-            )
-            
-            logger.info(f"Document {document_id} processed successfully: {result['chunk_count']} chunks")
+            logger.info(f"Document {document_id} processed successfully: {chunk_count} chunks")
             return {
                 "document_id": document_id,
-                "chunks_created": result["chunk_count"],
+                "chunks_created": chunk_count,
                 "status": "processed"
             }
         except Exception as e:
             logger.error(f"Failed to process document {document_id}: {e}")
             raise
     
+    def add_chunks(self, chunks: List[Any], document_id: int, source: str, first_chunk_id: int = 0) -> int:
+        """Embed already parsed chunks, add them to the vector store and return how many were added"""
+        if not chunks:
+            return 0
+        try:
+            result = self.document_processor.prepare_chunks(chunks, document_id, source, first_chunk_id)
+            self.vector_service.add_document_vectors(
+                result["embeddings"],
+                result["metadata"]
+            )
+            return result["chunk_count"]
+        except Exception as e:
+            logger.error(f"Failed to add chunks for document {document_id}: {e}")
+            raise
+    
+    def update_document(self, file_path: str, document_id: int) -> Dict[str, int]:
+        """Re-index a new version of a document, embedding only chunks that changed"""
+        chunks = []
+        for batch, _, _ in self.document_processor.iter_chunk_batches(file_path, settings.ingestion_pages_per_batch):
+            chunks.extend(batch)
+        return self.sync_chunks(chunks, document_id, file_path)
+    
+    def sync_chunks(self, chunks: List[Any], document_id: int, source: str) -> Dict[str, int]:
+        """Make the stored chunks of a document match chunks, diffing by content hash.
+        
+        Chunks whose text is already stored keep their vectors and only have
+        their position updated; removed chunks are deleted and only new ones
+        are embedded.
+        """
+        existing = self.vector_service.get_document_chunks(document_id)
+        ids_by_hash: Dict[str, List[str]] = {}
+        next_id = 0
+        for vector_id, meta in existing.items():
+            # Chunks indexed before hashes were stored are hashed from their text
+            key = meta.get("chunk_hash") or chunk_hash(meta.get("text", ""))
+            ids_by_hash.setdefault(key, []).append(vector_id)
+            suffix = vector_id.rsplit("_", 1)[-1]
+            if suffix.isdigit():
+                next_id = max(next_id, int(suffix) + 1)
+        
+        moved_ids, moved_metadata = [], []
+        new_chunks, new_positions = [], []
+        unchanged = 0
+        for position, chunk in enumerate(chunks):
+            matches = ids_by_hash.get(chunk_hash(chunk.page_content))
+            if not matches:
+                new_chunks.append(chunk)
+                new_positions.append(position)
+                continue
+            vector_id = matches.pop()
+            meta = existing[vector_id]
+            # source is the path of the version the chunk was first parsed
+            # from and differs on every update; rewriting it would touch every
+            # retained chunk
+            if meta.get("chunk_id") != position or "chunk_hash" not in meta:
+                moved_ids.append(vector_id)
+                moved_metadata.append({
+                    **meta,
+                    "chunk_id": position,
+                    "chunk_hash": chunk_hash(chunk.page_content)
+                })
+            else:
+                unchanged += 1
+        removed_ids = [vector_id for ids in ids_by_hash.values() for vector_id in ids]
+        
+        self.vector_service.delete_vectors(removed_ids)
+        self.vector_service.update_chunk_metadata(moved_ids, moved_metadata)
+        if new_chunks:
+            result = self.document_processor.prepare_chunks(new_chunks, document_id, source, chunk_ids=new_positions)
+            # Fresh ids so new chunks never collide with retained ones
+            ids = [f"{document_id}_{next_id + i}" for i in range(len(new_chunks))]
+            self.vector_service.add_document_vectors(result["embeddings"], result["metadata"], ids=ids)
+        
+        logger.info(
+            f"Document {document_id} updated: {len(new_chunks)} added, {len(removed_ids)} removed, "
+            f"{len(moved_ids)} moved, {unchanged} unchanged"
+        )
+        return {
+            "added": len(new_chunks),
+            "removed": len(removed_ids),
+            "moved": len(moved_ids),
+            "unchanged": unchanged
+        }
+    
     def search_documents(self, query: str, top_k: int = 5, metadata_filter: dict = None) -> List[Dict[str, Any]]:
         """Search for relevant document chunks with optional metadata filtering"""
-        return self.vector_service.search(query, top_k, metadata_filter)
+        if self.retrieval_cache is None:
+            return self.vector_service.search(query, top_k, metadata_filter)
+        
+        key = (normalize_query(query), top_k, filter_key(metadata_filter), self.vector_service.index_version)
+        results = self.retrieval_cache.get(key)
+        if results is None:
+            results = self.vector_service.search(query, top_k, metadata_filter)
+            self.retrieval_cache.set(key, results)
+        # Callers get their own copies; the cached results stay as they were
+        return copy.deepcopy(results)
+    
+    def search_documents_batch(self, queries: List[str], top_k: int = 5, metadata_filter: dict = None) -> List[List[Dict[str, Any]]]:
+        """Search for many queries, serving cached ones and sending the rest to the vector store in one batch"""
+        if self.retrieval_cache is None:
+            return self.vector_service.search_batch(queries, top_k, metadata_filter)
+        
+        version = self.vector_service.index_version
+        keys = [(normalize_query(query), top_k, filter_key(metadata_filter), version) for query in queries]
+        batch = [self.retrieval_cache.get(key) for key in keys]
+        # Search each distinct uncached query once
+        missing = list(dict.fromkeys(key for key, results in zip(keys, batch) if results is None))
+        if missing:
+            first_query = {}
+            for key, query in zip(keys, queries):
+                first_query.setdefault(key, query)
+            fresh = dict(zip(missing, self.vector_service.search_batch(
+                [first_query[key] for key in missing], top_k, metadata_filter
+            )))
+            for key, results in fresh.items():
+                self.retrieval_cache.set(key, results)
+            batch = [results if results is not None else fresh[key] for key, results in zip(keys, batch)]
+        return copy.deepcopy(batch)
+    
+    def retrieve(self, query: str, top_k: int = 5, metadata_filter: dict = None, rerank_budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Chunks to build the prompt from: search results, reranked when a reranker is configured"""
+        if self.reranker is None:
+            return self.search_documents(query, top_k, metadata_filter)
+        candidates = self.search_documents(query, max(top_k, settings.reranker_candidates), metadata_filter)
+        budget_ms = settings.reranker_budget_ms if rerank_budget_ms is None else rerank_budget_ms
+        return self.reranker.rerank(query, candidates, top_k, budget_ms)
+    
+    def pack_context(self, results: List[Dict[str, Any]]) -> tuple:
+        """Return (passages, report) for the prompt, within the current model's token budget"""
+        if self.context_packer is None:
+            return results, None
+        budget = settings.context_token_budgets.get(self.model_name, settings.context_token_budget)
+        passages, report = self.context_packer.pack(results, budget)
+        logger.info(
+            f"Packed {report['chunks']} chunks into {report['passages']} passages: "
+            f"{report['tokens_out']} tokens, {report['tokens_saved']} saved"
+        )
+        return passages, report
     
-    def generate_response(self, query: str, top_k: int = 5, min_score: float = 0.2, return_context: bool = False, metadata_filter: dict = None) -> Dict[str, Any]:
+    async def generate_response(self, query: str, top_k: int = 5, min_score: float = 0.2, return_context: bool = False, metadata_filter: dict = None, rerank_budget_ms: Optional[float] = None) -> Dict[str, Any]:
         """RAG pipeline with extra features and fallback inference"""
         logger.info(f"Generating response for query: {query[:100]}...")
 
-        results = self.search_documents(query, top_k, metadata_filter)
+        answer_key = None
+        if self.answer_cache is not None:
+            answer_key = (
+                normalize_query(query), top_k, min_score, return_context, filter_key(metadata_filter),
+                self.vector_service.index_version, self.model_name, hash(ANSWER_PROMPT_TEMPLATE)
+            )
+            cached = self.answer_cache.get(answer_key)
+            if cached is not None:
+                logger.info("Serving response from answer cache")
+                return copy.deepcopy(cached)
+
+        query_embedding = None
+        if self.semantic_cache is not None and not metadata_filter and not return_context:
+            query_embedding = await self._embed_query(query)
+            hit = self.semantic_cache.lookup(query_embedding, "answer", top_k)
+            if hit is not None:
+                logger.info("Serving response from semantic cache")
+                return {'answer': hit['answer'], 'sources': hit['sources'], 'confidence': hit['confidence']}
+
+        # Chroma queries are blocking; keep them off the event loop
+        results = await asyncio.to_thread(self.retrieve, query, top_k, metadata_filter, rerank_budget_ms)
         logger.info(f"Found {len(results)} relevant documents")
 
         if not results:
             logger.warning("No relevant context found for query")
             return {'answer': 'I could not find any relevant information in the uploaded documents to answer your question.', 'sources': [], 'confidence': 0.0, 'context': ''}
 
+        results, packing = self.pack_context(results)
+
         # Prepare context and sources
         context_parts = []
         for i, doc in enumerate(results):
@@ -135,23 +437,16 @@ class EnhancedRAGService:
         confidence = max([s['score'] for s in sources]) if sources else 0.0
 
         # Generate answer with configured LLM
-        prompt = f"""You are a helpful AI assistant. Answer the question based ONLY on the following provided context.
-If the answer is not in the context, say "I cannot answer this based on the provided documents."
-Do not use outside knowledge.
-
-Context:
-{context}
-
-Question: {query}
-
-Answer:"""
+        prompt = ANSWER_PROMPT_TEMPLATE.format(context=context, query=query)
         try:
             logger.info("Calling LLM for response generation")
+            llm_started = time.perf_counter()
             if isinstance(self.llm, AmazonQService):
-                response_text = self.llm.generate(prompt)
+                response_text = await asyncio.to_thread(self.llm.generate, prompt)
             else:
                 # SimpleOllama
-                response_text = self.llm.invoke(prompt)
+                response_text = await self.llm.ainvoke(prompt)
+            llm_seconds = time.perf_counter() - llm_started
             logger.info("LLM response generated successfully")
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
@@ -171,14 +466,37 @@ Answer:"""
             'sources': sources,
             'confidence': confidence
         }
+        if packing is not None:
+            output['context_tokens'] = packing
         if return_context:
             output['context'] = context
-        return output
+        if answer_key is not None:
+            self.answer_cache.set(answer_key, output)
+        if query_embedding is not None:
+            self.semantic_cache.add(
+                query_embedding, "answer", top_k, llm_seconds,
+                answer=response_text, sources=sources, confidence=confidence
+            )
+        return copy.deepcopy(output)
     
-    async def stream_response(self, query: str, top_k: int = 5) -> AsyncGenerator[Dict[str, Any], None]:
+    async def stream_response(self, query: str, top_k: int = 5, rerank_budget_ms: Optional[float] = None) -> AsyncGenerator[Dict[str, Any], None]:
         """Stream RAG response with real-time generation"""
+        query_embedding = None
+        if self.semantic_cache is not None:
+            query_embedding = await self._embed_query(query)
+            hit = self.semantic_cache.lookup(query_embedding, "stream", top_k)
+            if hit is not None:
+                # Replay in the same chunk format as a live generation
+                logger.info("Replaying streamed response from semantic cache")
+                yield {"type": "search_complete", "results_found": hit["results_found"]}
+                yield {"type": "sources", "sources": hit["sources"]}
+                for chunk in hit["chunks"]:
+                    yield {"type": "content", "content": chunk}
+                yield {"type": "done"}
+                return
+        
         # First yield search results
-        search_results = self.search_documents(query, top_k)
+        search_results = await asyncio.to_thread(self.retrieve, query, top_k, None, rerank_budget_ms)
         
         yield {
             "type": "search_complete",
@@ -193,6 +511,8 @@ Answer:"""
             yield {"type": "done"}
             return
         
+        search_results, packing = self.pack_context(search_results)
+        
         # Build context and enhanced sources
         context_parts = []
         sources = []
@@ -221,33 +541,31 @@ Answer:"""
         # Yield sources
         yield {
             "type": "sources",
-            "sources": sources
+            "sources": sources,
+            "context_tokens": packing
         }
         
         # Generate streaming response
-        prompt = f"""You are a helpful AI assistant. Answer the question based ONLY on the following provided context.
-If the answer is not in the context, say "I cannot answer this based on the provided documents."
-Include reference numbers [1], [2], etc. when citing specific information.
-
-Context:
-{context}
-
-Question: {query}
-
-Answer:"""
+        prompt = STREAM_PROMPT_TEMPLATE.format(context=context, query=query)
         
+        streamed = []
+        llm_started = time.perf_counter()
         try:
             # Stream LLM response. Support local streaming or AmazonQ fallback
             if isinstance(self.llm, AmazonQService):
-                for chunk in self.llm.stream_generate(prompt):
+                # Bedrock wrapper is synchronous; pull each chunk in a worker thread
+                # so they are forwarded as they arrive
+                chunks = self.llm.stream_generate(prompt)
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    streamed.append(chunk)
                     yield {
                         "type": "content",
                         "content": chunk
                     }
             else:
                 # SimpleOllama
-                stream = self.llm.stream(prompt)
-                for chunk in stream:
+                async for chunk in self.llm.astream(prompt):
+                    streamed.append(chunk)
                     yield {
                         "type": "content",
                         "content": chunk
@@ -267,6 +585,12 @@ Answer:"""
                     "content": word + " "
                 }
                 await asyncio.sleep(0.02)
+        else:
+            if query_embedding is not None:
+                self.semantic_cache.add(
+                    query_embedding, "stream", top_k, time.perf_counter() - llm_started,
+                    results_found=len(search_results), sources=sources, chunks=streamed
+                )
         
         yield {"type": "done"}
     
@@ -276,4 +600,14 @@ Answer:"""
     
     def get_stats(self) -> Dict[str, Any]:
         """Get RAG service statistics"""
-        return self.vector_service.get_stats()
\ No newline at end of file
+        stats = self.vector_service.get_stats()
+        if self.retrieval_cache is not None:
+            stats["retrieval_cache"] = self.retrieval_cache.stats()
+            stats["answer_cache"] = self.answer_cache.stats()
+        if self.semantic_cache is not None:
+            stats["semantic_cache"] = self.semantic_cache.stats()
+        if self.reranker is not None:
+            stats["reranker"] = self.reranker.stats()
+        if self.context_packer is not None:
+            stats["context_packer"] = self.context_packer.stats()
+        return stats
\ No newline at end of file
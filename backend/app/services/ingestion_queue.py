@@ -0,0 +1,475 @@
+import aiofiles
+import asyncio
+import gzip
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+from sqlalchemy import or_, select, update
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logger import logger
+from app.models.document import Document
+from app.schemas.processing_status import ProcessingStage
+from app.services.document_processor import count_pages, load_chunk_and_extract
+from app.services.enhanced_rag_service import EnhancedRAGService
+from app.utils.storage import StorageService, extracted_text_path
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion queue cannot accept another document."""
+
+class IngestionCancelled(Exception):
+    """Raised inside a job whose document was deleted while it was queued or running."""
+
+# Stages of a document that still has to be (re)processed
+PENDING_STAGES = [
+    ProcessingStage.UPLOADING.value,
+    ProcessingStage.PROCESSING.value,
+    ProcessingStage.EMBEDDING.value
+]
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+@dataclass
+class IngestionJob:
+    document_id: int
+    file_path: str
+    # Diff against the chunks already indexed instead of rebuilding them
+    incremental: bool = False
+    # Stored files of earlier versions, removed once this job has run
+    replaces: List[str] = field(default_factory=list)
+
+class QueueSlot:
+    """A place held in the ingestion queue while a document is stored.
+
+    Reserving before the upload is written means a stored and committed
+    document can always be queued. A slot not used by the end of its with
+    block is given back.
+    """
+
+    def __init__(self, queue: "IngestionQueue"):
+        self._queue = queue
+        self._held = True
+
+    def enqueue(self, document_id: int, file_path: str, incremental: bool = False, replaces: Optional[List[str]] = None):
+        self.release()
+        self._queue.enqueue(document_id, file_path, incremental=incremental, replaces=replaces)
+
+    def release(self):
+        if self._held:
+            self._held = False
+            self._queue._reserved -= 1
+
+    def __enter__(self) -> "QueueSlot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class IngestionQueue:
+    """Bounded queue of documents waiting to be parsed, embedded and indexed.
+
+    Jobs are processed by a fixed number of async workers. Parsing runs in a
+    process pool since it is CPU-bound; embedding and indexing run in a
+    thread. Progress is written to the document's status columns, which also
+    makes the queue durable: documents left unfinished by a restart are
+    re-queued (interrupted updates are redone as full rebuilds).
+
+    Each pending document carries a claim timestamp, refreshed while a job
+    for it is queued or running. A periodic pass re-queues pending documents
+    whose claim has lapsed, taking them with a conditional UPDATE so that
+    with several server processes only one of them picks each document up.
+
+    Deleting a document cancels its jobs: cancel() marks them here, and a job
+    whose status update finds the row gone (deleted by another process) stops
+    too. A stopped job removes the vectors it already added.
+    """
+
+    def __init__(
+        self,
+        rag_service: EnhancedRAGService,
+        storage: StorageService,
+        workers: int = None,
+        max_size: int = None,
+        process_workers: int = None
+    ):
+        self.rag_service = rag_service
+        self.storage = storage
+        self.workers = workers or settings.ingestion_workers
+        self.max_size = max_size or settings.ingestion_queue_size
+        self.process_workers = process_workers or settings.ingestion_process_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._reserved = 0
+        # Documents with a job queued or running here, whose claims are kept fresh
+        self._active: Counter = Counter()
+        # Jobs for the same document run one at a time, in queue order
+        self._document_locks: Dict[int, asyncio.Lock] = {}
+        # Documents deleted while a job for them was queued or running
+        self._cancelled: Set[int] = set()
+
+    @property
+    def started(self) -> bool:
+        return self._queue is not None
+
+    def full(self) -> bool:
+        return self.started and self._queue.qsize() + self._reserved >= self.max_size
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self.started else 0
+
+    async def start(self):
+        if self.started:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        # Spawned workers avoid forking a process that already runs threads
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._recovery_loop(), name="ingestion-recovery"))
+        logger.info(f"Ingestion queue started with {self.workers} workers")
+        await self._recover_pending()
+
+    async def stop(self):
+        if not self.started:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._process_pool.shutdown(wait=False, cancel_futures=True)
+        self._process_pool = None
+        self._queue = None
+        self._reserved = 0
+        self._active.clear()
+        self._document_locks.clear()
+        self._cancelled.clear()
+        logger.info("Ingestion queue stopped")
+
+    def reserve(self) -> QueueSlot:
+        """Hold a place in the queue for a document about to be stored."""
+        if not self.started:
+            raise RuntimeError("Ingestion queue is not running")
+        if self.full():
+            raise IngestionQueueFull(f"Ingestion queue is full ({self.max_size} documents pending)")
+        self._reserved += 1
+        return QueueSlot(self)
+
+    def enqueue(self, document_id: int, file_path: str, incremental: bool = False, replaces: Optional[List[str]] = None):
+        """Queue a stored document for processing without waiting."""
+        if not self.started:
+            raise RuntimeError("Ingestion queue is not running")
+        if self.full():
+            raise IngestionQueueFull(f"Ingestion queue is full ({self.max_size} documents pending)")
+        self._queue.put_nowait(IngestionJob(
+            document_id=document_id, file_path=file_path, incremental=incremental, replaces=list(replaces or [])
+        ))
+        self._active[document_id] += 1
+        self._document_locks.setdefault(document_id, asyncio.Lock())
+        logger.info(f"Queued document {document_id} for ingestion ({self.qsize()} pending)")
+
+    def cancel(self, document_id: int):
+        """Stop the jobs queued or running here for a document that is being deleted."""
+        if document_id in self._active:
+            self._cancelled.add(document_id)
+            logger.info(f"Cancelling ingestion of deleted document {document_id}")
+
+    async def _recovery_loop(self):
+        while True:
+            await asyncio.sleep(settings.ingestion_recovery_interval_seconds)
+            try:
+                await self._refresh_claims()
+                await self._recover_pending()
+            except Exception as e:
+                logger.error(f"Ingestion recovery pass failed: {e}")
+
+    async def _refresh_claims(self):
+        """Renew the claims on documents queued or running here."""
+        if not self._active:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Document)
+                .where(Document.id.in_(list(self._active)), Document.status.in_(PENDING_STAGES))
+                .values(claimed_at=utcnow())
+            )
+            await db.commit()
+
+    async def _recover_pending(self):
+        """Re-queue pending documents whose claim has lapsed."""
+        cutoff = utcnow() - timedelta(seconds=settings.ingestion_claim_timeout_seconds)
+        unclaimed = [
+            Document.status.in_(PENDING_STAGES),
+            or_(Document.claimed_at.is_(None), Document.claimed_at < cutoff)
+        ]
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Document.id, Document.file_path, Document.superseded_paths)
+                    .where(*unclaimed)
+                    .order_by(Document.id)
+                )
+                pending = result.all()
+        except Exception as e:
+            logger.error(f"Failed to load pending ingestion jobs: {e}")
+            return
+
+        for document_id, file_path, superseded_paths in pending:
+            if document_id in self._active:
+                continue
+            if self.full():
+                logger.warning(f"Ingestion queue full, {document_id} and later documents stay pending")
+                break
+            async with AsyncSessionLocal() as db:
+                # Only the process whose UPDATE still sees the lapsed claim takes the document
+                result = await db.execute(
+                    update(Document)
+                    .where(Document.id == document_id, *unclaimed)
+                    .values(claimed_at=utcnow())
+                )
+                await db.commit()
+            if result.rowcount == 1:
+                # The files an interrupted update was to remove are removed by this job
+                self.enqueue(document_id, file_path, replaces=superseded_paths.split("\n") if superseded_paths else None)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                async with self._document_locks[job.document_id]:
+                    await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} failed on document {job.document_id}: {e}")
+            finally:
+                self._active[job.document_id] -= 1
+                if self._active[job.document_id] <= 0:
+                    del self._active[job.document_id]
+                    del self._document_locks[job.document_id]
+                    self._cancelled.discard(job.document_id)
+                self._queue.task_done()
+
+    async def _local_file(self, file_path: str) -> Tuple[str, bool]:
+        """A filesystem path for the stored file, and whether it is a temporary copy to remove afterwards"""
+        local_path = self.storage.local_path(file_path)
+        if local_path:
+            # Local storage is parsed in place
+            return local_path, False
+        temp_path = f"workspace/temp/{file_path}"
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        try:
+            async with aiofiles.open(temp_path, "wb") as f:
+                async for chunk in self.storage.iter_file(file_path):
+                    await f.write(chunk)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return temp_path, True
+
+    async def _process(self, job: IngestionJob):
+        temp_path = None
+        try:
+            await self._progress(job, ProcessingStage.PROCESSING, 0, "Processing document...")
+
+            source_path, is_temp = await self._local_file(job.file_path)
+            if is_temp:
+                temp_path = source_path
+
+            logger.info(f"Starting RAG processing for document {job.document_id}")
+            if job.incremental:
+                message = await self._index_incremental(job, source_path)
+            else:
+                message = await self._index_full(job, source_path)
+
+            await self._progress(job, ProcessingStage.COMPLETED, 100, message)
+            logger.info(f"RAG processing completed for document {job.document_id}")
+        except IngestionCancelled:
+            await self._drop_vectors(job)
+        except Exception as e:
+            logger.error(f"RAG processing failed for document {job.document_id}: {e}")
+            try:
+                if not await self._set_status(job.document_id, ProcessingStage.ERROR, None, "Processing failed", error=str(e)):
+                    # Deleted while it ran, which may be what broke the job
+                    await self._drop_vectors(job)
+            except Exception as commit_error:
+                logger.error(f"Failed to update error status for document {job.document_id}: {commit_error}")
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            if job.replaces:
+                # Earlier jobs for this document, which may have read them, are done
+                for path in job.replaces:
+                    await self.storage.delete_file(path)
+                    await self.storage.delete_file(extracted_text_path(path))
+                await self._forget_superseded(job)
+
+    async def _forget_superseded(self, job: IngestionJob):
+        """Take the files this job removed off the document's superseded_paths"""
+        try:
+            async with AsyncSessionLocal() as db:
+                for _ in range(3):
+                    current = (await db.execute(
+                        select(Document.superseded_paths).where(Document.id == job.document_id)
+                    )).scalar_one_or_none()
+                    if not current:
+                        return
+                    remaining = [path for path in current.split("\n") if path not in job.replaces]
+                    # Only if no update appended a path in the meantime
+                    result = await db.execute(
+                        update(Document)
+                        .where(Document.id == job.document_id, Document.superseded_paths == current)
+                        .values(superseded_paths="\n".join(remaining) or None)
+                    )
+                    await db.commit()
+                    if result.rowcount == 1:
+                        return
+        except Exception as e:
+            # The files are gone; a stale entry is only deleted again later
+            logger.warning(f"Failed to update superseded files of document {job.document_id}: {e}")
+
+    async def _drop_vectors(self, job: IngestionJob):
+        """Remove what a job indexed for a document deleted while it ran"""
+        logger.info(f"Document {job.document_id} was deleted, removing the vectors its job added")
+        try:
+            await asyncio.to_thread(self.rag_service.delete_document, job.document_id)
+        except Exception as e:
+            logger.error(f"Failed to delete document {job.document_id} from vector store: {e}")
+
+    def _parse(self, path: str, start: int) -> asyncio.Future:
+        """Parse and chunk one page window in the process pool; resolves to (chunks, extracted text)"""
+        processor = self.rag_service.document_processor
+        return asyncio.get_running_loop().run_in_executor(
+            self._process_pool,
+            load_chunk_and_extract,
+            path,
+            processor.chunk_size,
+            processor.chunk_overlap,
+            start,
+            start + settings.ingestion_pages_per_batch
+        )
+
+    def _open_text(self, file_path: str) -> Tuple[str, TextIO]:
+        """A local gzip file collecting the extracted text window by window"""
+        temp_path = f"workspace/temp/{extracted_text_path(file_path)}"
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        return temp_path, gzip.open(temp_path, "wt", encoding="utf-8")
+
+    async def _store_text(self, file_path: str, temp_path: str):
+        """Store the extracted text next to the original for the content endpoint.
+
+        A failure is only logged: the endpoint falls back to extracting the
+        text from the original file.
+        """
+        try:
+            with open(temp_path, "rb") as f:
+                await self.storage.store_fileobj(extracted_text_path(file_path), f)
+        except Exception as e:
+            logger.warning(f"Failed to store extracted text of {file_path}: {e}")
+
+    async def _index_full(self, job: IngestionJob, path: str) -> str:
+        loop = asyncio.get_running_loop()
+        total_pages = await loop.run_in_executor(self._process_pool, count_pages, path)
+
+        # Clear vectors from an interrupted earlier attempt so retries are idempotent
+        await asyncio.to_thread(self.rag_service.delete_document, job.document_id)
+
+        # Parse page windows in the process pool while the previous window
+        # is embedded and upserted: at most two windows are in memory and
+        # early pages become searchable before the whole file is parsed
+        starts = list(range(0, total_pages, settings.ingestion_pages_per_batch))
+        pending = self._parse(path, starts[0]) if starts else None
+        chunk_count = 0
+        text_path, text_file = self._open_text(job.file_path)
+        try:
+            for i, start in enumerate(starts):
+                chunks, text = await pending
+                pending = self._parse(path, starts[i + 1]) if i + 1 < len(starts) else None
+                await asyncio.to_thread(text_file.write, text)
+                self._check_cancelled(job)
+                chunk_count += await asyncio.to_thread(
+                    self.rag_service.add_chunks, chunks, job.document_id, path, chunk_count
+                )
+                pages_done = min(start + settings.ingestion_pages_per_batch, total_pages)
+                await self._progress(
+                    job,
+                    ProcessingStage.EMBEDDING,
+                    5 + (90 * pages_done) // total_pages,
+                    f"Indexed {pages_done} of {total_pages} pages ({chunk_count} chunks)"
+                )
+            text_file.close()
+            await self._store_text(job.file_path, text_path)
+        finally:
+            if pending is not None:
+                # A window prefetched before a failure may still be reading
+                # the file; let it finish before the file is cleaned up
+                await asyncio.gather(pending, return_exceptions=True)
+            text_file.close()
+            os.remove(text_path)
+        return "Document processed successfully"
+
+    async def _index_incremental(self, job: IngestionJob, path: str) -> str:
+        loop = asyncio.get_running_loop()
+        total_pages = await loop.run_in_executor(self._process_pool, count_pages, path)
+
+        # The diff needs every chunk of the new version, but only their text:
+        # nothing is embedded until we know which chunks are new
+        chunks = []
+        text_path, text_file = self._open_text(job.file_path)
+        try:
+            for start in range(0, total_pages, settings.ingestion_pages_per_batch):
+                window_chunks, text = await self._parse(path, start)
+                chunks.extend(window_chunks)
+                await asyncio.to_thread(text_file.write, text)
+                pages_done = min(start + settings.ingestion_pages_per_batch, total_pages)
+                await self._progress(
+                    job,
+                    ProcessingStage.PROCESSING,
+                    5 + (45 * pages_done) // total_pages,
+                    f"Parsed {pages_done} of {total_pages} pages"
+                )
+            text_file.close()
+            await self._store_text(job.file_path, text_path)
+        finally:
+            text_file.close()
+            os.remove(text_path)
+
+        await self._progress(job, ProcessingStage.EMBEDDING, 50, f"Comparing {len(chunks)} chunks...")
+        diff = await asyncio.to_thread(self.rag_service.sync_chunks, chunks, job.document_id, path)
+        return (
+            f"Document updated: {diff['added']} chunks added, {diff['removed']} removed, "
+            f"{diff['moved'] + diff['unchanged']} reused"
+        )
+
+    def _check_cancelled(self, job: IngestionJob):
+        if job.document_id in self._cancelled:
+            raise IngestionCancelled(f"Document {job.document_id} was deleted")
+
+    async def _progress(self, job: IngestionJob, stage: ProcessingStage, progress: int, message: str):
+        """Record a running job's progress; stops the job once its document is deleted"""
+        self._check_cancelled(job)
+        if not await self._set_status(job.document_id, stage, progress, message):
+            raise IngestionCancelled(f"Document {job.document_id} was deleted")
+
+    async def _set_status(self, document_id: int, stage: ProcessingStage, progress: Optional[int], message: str, error: str = None) -> bool:
+        """Update a document's status columns; False when the document no longer exists"""
+        values = {"status": stage.value, "processing_message": message, "processing_error": error}
+        # Progress also renews the claim; a finished document needs none
+        values["claimed_at"] = utcnow() if stage.value in PENDING_STAGES else None
+        if progress is not None:
+            values["processing_progress"] = progress
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(update(Document).where(Document.id == document_id).values(**values))
+            await db.commit()
+        return result.rowcount == 1
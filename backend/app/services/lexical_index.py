@@ -0,0 +1,140 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Keeps identifiers such as "ERR-4021", "v2.3.1" or "part_no" whole
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:#][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in is it its of on or "
+    "that the this to was what when where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms; compound identifiers are indexed whole and by their parts"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in _PART_RE.findall(token) if part not in _STOPWORDS)
+    return tokens
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over chunk texts, keyed by vector id.
+
+    Complements dense retrieval for exact terms such as error codes and part
+    numbers that embeddings tend to blur.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._by_document: Dict[Any, Set[str]] = {}
+        self._owner: Dict[str, Any] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, ids: List[str], texts: List[str], document_ids: List[Any]):
+        with self._lock:
+            for chunk_id, text, document_id in zip(ids, texts, document_ids):
+                if chunk_id in self._lengths:
+                    self._remove(chunk_id)
+                tokens = tokenize(text)
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+                self._lengths[chunk_id] = len(tokens)
+                self._terms[chunk_id] = list(counts)
+                self._owner[chunk_id] = document_id
+                self._by_document.setdefault(document_id, set()).add(chunk_id)
+                self._total_length += len(tokens)
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+
+    def remove_document(self, document_id: Any):
+        with self._lock:
+            for chunk_id in list(self._by_document.get(document_id, ())):
+                self._remove(chunk_id)
+
+    def _remove(self, chunk_id: str):
+        if chunk_id not in self._lengths:
+            return
+        for term in self._terms.pop(chunk_id):
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id)
+        document_id = self._owner.pop(chunk_id)
+        chunks = self._by_document[document_id]
+        chunks.discard(chunk_id)
+        if not chunks:
+            del self._by_document[document_id]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._terms.clear()
+            self._by_document.clear()
+            self._owner.clear()
+            self._total_length = 0
+
+    def search(self, query: str, top_k: int, min_score_ratio: float = 0.0) -> List[Tuple[str, float]]:
+        """Return up to top_k (vector id, BM25 score) pairs, best first.
+
+        Hits scoring below min_score_ratio of the best hit are dropped, so
+        chunks matching only terms that occur almost everywhere do not pad
+        the ranking.
+        """
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        with self._lock:
+            n = len(self._lengths)
+            if not n or not terms:
+                return []
+            avg_length = self._total_length / n
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        if ranked and min_score_ratio > 0:
+            cutoff = ranked[0][1] * min_score_ratio
+            ranked = [item for item in ranked if item[1] >= cutoff]
+        return ranked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chunks": len(self._lengths),
+            "terms": len(self._postings),
+            "documents": len(self._by_document)
+        }
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank) across rankings"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:top_k] if top_k is not None else fused
@@ -0,0 +1,119 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from app.core.logger import logger
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks with a local cross-encoder, within a latency budget.
+
+    The model loads in a background thread on first use; until it is ready,
+    and whenever scoring would overrun the budget, candidates keep their
+    retrieval order. Pairs are scored in batches and the observed cost per
+    pair is tracked, so a request whose candidates cannot be scored in time
+    skips reranking instead of wasting the budget.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 16, max_length: int = 512, device: str = "cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self.reranked = 0
+        self.fallbacks: Dict[str, int] = {"loading": 0, "budget": 0, "error": 0}
+        self.total_seconds = 0.0
+        self._model = None
+        self._load_error: Optional[str] = None
+        self._loading = False
+        self._seconds_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Load the model, blocking; safe to call from several threads"""
+        with self._lock:
+            if self._model is not None or self._load_error is not None:
+                return
+            try:
+                from sentence_transformers import CrossEncoder
+                started = time.perf_counter()
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+                logger.info(f"Reranker {self.model_name} loaded in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                self._load_error = str(e)
+                logger.error(f"Failed to load reranker {self.model_name}, keeping retrieval order: {e}")
+            finally:
+                self._loading = False
+
+    def load_in_background(self):
+        """Start loading the model without waiting for it"""
+        with self._lock:
+            if self._loading or self._model is not None or self._load_error is not None:
+                return
+            self._loading = True
+        threading.Thread(target=self.load, name="reranker-load", daemon=True).start()
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_k: int, budget_ms: float) -> List[Dict[str, Any]]:
+        """Return the top_k candidates by cross-encoder score, or in their original order on fallback"""
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+        if not self.ready:
+            self.load_in_background()
+            self.fallbacks["loading" if self._load_error is None else "error"] += 1
+            return candidates[:top_k]
+
+        budget = budget_ms / 1000.0
+        if self._seconds_per_pair is not None and self._seconds_per_pair * len(candidates) > budget:
+            # Decay the estimate so a transient slowdown does not disable reranking for good
+            self._seconds_per_pair *= 0.9
+            self.fallbacks["budget"] += 1
+            return candidates[:top_k]
+
+        started = time.perf_counter()
+        scores: List[float] = []
+        try:
+            for i in range(0, len(candidates), self.batch_size):
+                batch = candidates[i:i + self.batch_size]
+                scores.extend(
+                    float(score) for score in
+                    self._model.predict([(query, c["text"]) for c in batch], batch_size=self.batch_size)
+                )
+                elapsed = time.perf_counter() - started
+                self._observe(elapsed / len(scores))
+                if elapsed > budget and len(scores) < len(candidates):
+                    logger.warning(f"Reranking exceeded {budget_ms:.0f}ms budget after {len(scores)} pairs")
+                    self.fallbacks["budget"] += 1
+                    return candidates[:top_k]
+        except Exception as e:
+            logger.error(f"Reranking failed, keeping retrieval order: {e}")
+            self.fallbacks["error"] += 1
+            return candidates[:top_k]
+
+        self.reranked += 1
+        self.total_seconds += time.perf_counter() - started
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)[:top_k]
+        results = []
+        for rank, i in enumerate(order, start=1):
+            result = dict(candidates[i])
+            result["rerank_score"] = scores[i]
+            result["rank"] = rank
+            results.append(result)
+        return results
+
+    def _observe(self, seconds_per_pair: float):
+        # Exponential moving average, so the estimate follows load changes
+        if self._seconds_per_pair is None:
+            self._seconds_per_pair = seconds_per_pair
+        else:
+            self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * seconds_per_pair
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "ready": self.ready,
+            "reranked": self.reranked,
+            "fallbacks": dict(self.fallbacks),
+            "avg_ms": round(1000 * self.total_seconds / self.reranked, 1) if self.reranked else None
+        }
@@ -0,0 +1,97 @@
+import copy
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+class SemanticCache:
+    """Previously generated answers, looked up by query-embedding similarity.
+
+    Catches paraphrases that an exact-match cache misses. Vectors live in a
+    preallocated matrix so a lookup is a single matrix-vector product; when
+    full, the least recently used slot is overwritten. Payloads are copied
+    in and out, so callers can change what they get without changing the cache.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_llm_seconds = 0.0
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: np.ndarray, kind: str, top_k: int) -> Optional[Dict[str, Any]]:
+        """Return the best cached entry of this kind above the threshold."""
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._vectors @ query
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is None or entry["kind"] != kind or entry["top_k"] != top_k:
+                    continue
+                if entry["expires_at"] <= now:
+                    self._entries[slot] = None
+                    self._vectors[slot] = 0
+                    continue
+                self._last_used[slot] = now
+                self.hits += 1
+                self.saved_llm_seconds += entry["llm_seconds"]
+                return copy.deepcopy(entry)
+            self.misses += 1
+            return None
+
+    def add(self, embedding: np.ndarray, kind: str, top_k: int, llm_seconds: float, **payload):
+        """Cache an answer; payload holds whatever the caller replays on a hit."""
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry, or the embedding model changed dimension
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+                self._last_used[:] = 0
+            free = [i for i, entry in enumerate(self._entries) if entry is None]
+            slot = free[0] if free else int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._last_used[slot] = now
+            self._entries[slot] = {
+                "kind": kind,
+                "top_k": top_k,
+                "llm_seconds": llm_seconds,
+                "expires_at": now + self.ttl_seconds,
+                **copy.deepcopy(payload)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.max_entries
+            self._last_used[:] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_llm_seconds": round(self.saved_llm_seconds, 3),
+            "entries": sum(1 for entry in self._entries if entry is not None),
+            "threshold": self.threshold
+        }
@@ -0,0 +1,89 @@
+import threading
+from typing import Optional
+from app.services.vector_service import VectorService
+from app.services.document_processor import DocumentProcessor
+from app.services.enhanced_rag_service import EnhancedRAGService, build_llm
+from app.services.ingestion_queue import IngestionQueue
+from app.utils.file_utils import get_parsing_executor
+from app.utils.storage import get_storage_service
+from app.core.logger import logger
+
+class ServiceContainer:
+    """App-scoped holder for the RAG components.
+
+    The Chroma client, document processor and LLM client are built once at
+    startup and shared by every request, so the hot path only runs the query.
+    """
+
+    def __init__(self):
+        self.vector_service: Optional[VectorService] = None
+        self.document_processor: Optional[DocumentProcessor] = None
+        self.llm = None
+        self.rag_service: Optional[EnhancedRAGService] = None
+        self.ingestion_queue: Optional[IngestionQueue] = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self.rag_service is not None
+
+    def startup(self):
+        """Build the shared services. Safe to call more than once."""
+        with self._lock:
+            if self.started:
+                return
+            logger.info("Starting service container")
+            self.vector_service = VectorService()
+            self.document_processor = DocumentProcessor()
+            self.llm = build_llm()
+            self.rag_service = EnhancedRAGService(
+                vector_service=self.vector_service,
+                document_processor=self.document_processor,
+                llm=self.llm
+            )
+            self.ingestion_queue = IngestionQueue(self.rag_service, get_storage_service())
+            logger.info("Service container started")
+
+    async def shutdown(self):
+        """Release the shared services."""
+        if not self.started:
+            return
+        logger.info("Shutting down service container")
+        await self.ingestion_queue.stop()
+        get_parsing_executor().shutdown()
+        if hasattr(self.llm, "aclose"):
+            # Close pooled LLM connections
+            await self.llm.aclose()
+        with self._lock:
+            self.ingestion_queue = None
+            self.rag_service = None
+            self.llm = None
+            self.document_processor = None
+            self.vector_service = None
+
+    async def start_workers(self):
+        """Start background workers; call from within the running event loop."""
+        self.startup()
+        await self.ingestion_queue.start()
+        if self.rag_service.reranker is not None:
+            # Load the model now rather than on the first question
+            self.rag_service.reranker.load_in_background()
+
+    def get_rag_service(self) -> EnhancedRAGService:
+        if not self.started:
+            # Scripts and background jobs may run without the app lifespan
+            self.startup()
+        return self.rag_service
+
+    def get_ingestion_queue(self) -> IngestionQueue:
+        if not self.started:
+            self.startup()
+        return self.ingestion_queue
+
+_service_container = None
+
+def get_service_container() -> ServiceContainer:
+    global _service_container
+    if _service_container is None:
+        _service_container = ServiceContainer()
+    return _service_container
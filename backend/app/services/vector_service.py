@@ -1,14 +1,25 @@
 import chromadb
+import os
+import time
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from collections import Counter
+from typing import List, Dict, Any, Callable, Optional
+import numpy as np
 from app.utils.embedding_utils import get_embeddings
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.vector_stats import VectorStats
 from app.core.config import settings
+from app.core.logger import logger
 
 class VectorService:
-    def __init__(self, persist_dir: str = None):
+    def __init__(self, persist_dir: str = None, search_mode: str = None):
         if persist_dir is None:
             persist_dir = settings.chroma_db_path
+        self.search_mode = search_mode or settings.search_mode
+        if self.search_mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unsupported search mode: {self.search_mode}")
             
+        self.persist_dir = persist_dir
         self.client = chromadb.PersistentClient(path=persist_dir)
         # Use the Ollama embedding function for the collection
         self.embedding_function = get_embeddings()
@@ -16,24 +27,107 @@ class VectorService:
             name="documents_ollama",
             embedding_function=self.embedding_function
         )
+        # Bumped on every add/delete so cached results can be keyed by it
+        self.index_version = 0
+        self._change_listeners: List[Callable[[], None]] = []
+        
+        # (monotonic time measured, bytes); the directory walk is cached
+        self._disk_usage = (float("-inf"), 0)
+        
+        # Counters kept next to the collection so stats never scan it
+        self.stats = VectorStats(os.path.join(persist_dir, "vector_stats.sqlite3"))
+        if not self.stats.initialized:
+            logger.info("Building vector stats counters from the existing collection")
+            self.recompute_stats()
+        
+        # BM25 index over chunk texts, kept in memory and rebuilt on startup
+        self.lexical_index: Optional[LexicalIndex] = None
+        if self.search_mode == "hybrid":
+            self.lexical_index = LexicalIndex()
+            self.rebuild_lexical_index()
+    
+    def add_change_listener(self, listener: Callable[[], None]):
+        """Register a callback run after vectors are added or deleted"""
+        self._change_listeners.append(listener)
     
-    def add_document_vectors(self, embeddings: List[List[float]], metadata: List[Dict[str, Any]]):
+    def _notify_change(self):
+        self.index_version += 1
+        for listener in self._change_listeners:
+            listener()
+    
+    def add_document_vectors(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]], ids: List[str] = None):
         """Add document vectors to ChromaDB"""
         texts = [meta["text"] for meta in metadata]
-        ids = [f"{meta['document_id']}_{meta['chunk_id']}" for meta in metadata]
+        if ids is None:
+            ids = [f"{meta['document_id']}_{meta['chunk_id']}" for meta in metadata]
         
-        # ChromaDB expects embeddings as list of lists, which OllamaEmbeddings provides
+        # ChromaDB accepts the float32 (n, dim) array directly
         self.collection.add(
             embeddings=embeddings,
             documents=texts,
             metadatas=metadata,
             ids=ids
         )
+        self.stats.record_added(
+            Counter(meta["document_id"] for meta in metadata),
+            embeddings.shape[1] if len(embeddings) else None
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, texts, [meta["document_id"] for meta in metadata])
+        self._notify_change()
+    
+    def rebuild_lexical_index(self, page_size: int = None):
+        """Re-read every chunk text from the collection into the lexical index, a page at a time"""
+        page_size = page_size or settings.collection_page_size
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add(
+                page["ids"], page["documents"], [meta.get("document_id") for meta in page["metadatas"]]
+            )
+            offset += len(page["ids"])
+        logger.info(f"Lexical index built over {len(self.lexical_index)} chunks")
     
-    def search(self, query: str, top_k: int = 5, metadata_filter: dict = None) -> List[Dict[str, Any]]:
-        """Search for similar documents with optional metadata filtering"""
+    def search(self, query: str, top_k: int = 5, metadata_filter: dict = None, mode: str = None) -> List[Dict[str, Any]]:
+        """Search for similar documents with optional metadata filtering.
+        
+        In hybrid mode, BM25 and vector rankings are fused with reciprocal
+        rank fusion, so exact identifiers are found even when the embedding
+        does not rank them highly.
+        """
+        return self.search_batch([query], top_k, metadata_filter, mode)[0]
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, metadata_filter: dict = None, mode: str = None) -> List[List[Dict[str, Any]]]:
+        """Search for many queries at once: one embedding call and one Chroma query for all of them"""
+        if not queries:
+            return []
+        # Embed through the embedding function directly so repeated queries
+        # are served from the embedding cache
+        query_embeddings = self.embedding_function.embed_texts(queries)
+        mode = mode or self.search_mode
+        if mode == "hybrid" and self.lexical_index is not None:
+            candidates = max(top_k, settings.hybrid_candidates)
+            dense_lists = self._vector_search(query_embeddings, candidates, metadata_filter)
+            return [
+                self._hybrid_search(query, query_embedding, dense, top_k, metadata_filter)
+                for query, query_embedding, dense in zip(queries, query_embeddings, dense_lists)
+            ]
+        
+        batch_results = []
+        for dense in self._vector_search(query_embeddings, top_k, metadata_filter):
+            formatted_results = [result for _, result in dense]
+            for i, result in enumerate(formatted_results):
+                result["rank"] = i + 1
+            batch_results.append(formatted_results)
+        return batch_results
+    
+    def _vector_search(self, query_embeddings: np.ndarray, top_k: int, metadata_filter: dict = None) -> List[List[tuple]]:
+        """Nearest chunks for each query as (vector id, result) pairs, best first"""
         query_args = {
-            "query_texts": [query],
+            "query_embeddings": query_embeddings,
             "n_results": top_k
         }
         if metadata_filter:
@@ -41,34 +135,116 @@ class VectorService:
             
         results = self.collection.query(**query_args)
 
-        formatted_results = []
-        if results['documents']:
-            for i, (doc, meta, distance) in enumerate(zip(
-                results['documents'][0],
-                results['metadatas'][0], 
-                results['distances'][0]
-            )):
+        batch_results = []
+        for ids, docs, metas, distances in zip(
+            results['ids'],
+            results['documents'],
+            results['metadatas'], 
+            results['distances']
+        ):
+            formatted_results = []
+            for chunk_id, doc, meta, distance in zip(ids, docs, metas, distances):
                 result = meta.copy()
                 result["text"] = doc
                 result["distance"] = distance
-                result["rank"] = i + 1
-                formatted_results.append(result)
+                formatted_results.append((chunk_id, result))
+            batch_results.append(formatted_results)
 
+        return batch_results
+    
+    def _hybrid_search(self, query: str, query_embedding: np.ndarray, dense_results: List[tuple], top_k: int,
+                       metadata_filter: dict = None) -> List[Dict[str, Any]]:
+        candidates = max(top_k, settings.hybrid_candidates)
+        dense = dict(dense_results)
+        lexical = [chunk_id for chunk_id, _ in self.lexical_index.search(
+            query, candidates, settings.hybrid_lexical_min_score_ratio
+        )]
+        if lexical and metadata_filter:
+            allowed = set(self.collection.get(ids=lexical, where=metadata_filter, include=[])["ids"])
+            lexical = [chunk_id for chunk_id in lexical if chunk_id in allowed]
+        
+        fused = reciprocal_rank_fusion([list(dense), lexical], k=settings.hybrid_rrf_k, top_k=top_k)
+        
+        # Chunks found only lexically still need their text and a vector
+        # distance, which callers turn into a relevance score
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in dense]
+        if missing:
+            rows = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            query_vector = np.asarray(query_embedding, dtype=np.float32).ravel()
+            for chunk_id, doc, meta, embedding in zip(rows["ids"], rows["documents"], rows["metadatas"], rows["embeddings"]):
+                result = meta.copy()
+                result["text"] = doc
+                # Same squared L2 distance Chroma reports for the collection
+                result["distance"] = float(np.sum((np.asarray(embedding, dtype=np.float32) - query_vector) ** 2))
+                dense[chunk_id] = result
+        
+        formatted_results = []
+        for chunk_id, fusion_score in fused:
+            if chunk_id not in dense:
+                continue  # Deleted between the lexical lookup and the fetch
+            result = dense[chunk_id]
+            result["fusion_score"] = fusion_score
+            result["rank"] = len(formatted_results) + 1
+            formatted_results.append(result)
         return formatted_results
     
+    def get_document_chunks(self, document_id: int) -> Dict[str, Dict[str, Any]]:
+        """Metadata of every stored chunk of a document, keyed by vector id"""
+        results = self.collection.get(where={"document_id": document_id}, include=["metadatas"])
+        return dict(zip(results["ids"], results["metadatas"]))
+    
+    def update_chunk_metadata(self, ids: List[str], metadata: List[Dict[str, Any]]):
+        """Replace chunk metadata without re-embedding"""
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadata)
+            self._notify_change()
+    
+    def delete_vectors(self, ids: List[str]):
+        """Remove individual chunk vectors"""
+        if ids:
+            existing = self.collection.get(ids=ids, include=["metadatas"])
+            self.collection.delete(ids=ids)
+            self.stats.record_removed(Counter(meta["document_id"] for meta in existing["metadatas"]))
+            if self.lexical_index is not None:
+                self.lexical_index.remove(ids)
+            self._notify_change()
+    
     def delete_document_vectors(self, document_id: int):
         """Remove vectors for a specific document"""
-        results = self.collection.get(where={"document_id": document_id})
+        results = self.collection.get(where={"document_id": document_id}, include=[])
         if results['ids']:
             self.collection.delete(ids=results['ids'])
+            self.stats.record_document_removed(document_id)
+            if self.lexical_index is not None:
+                self.lexical_index.remove_document(document_id)
+            self._notify_change()
+    
+    def recompute_stats(self, page_size: int = None) -> Dict[str, Any]:
+        """Rebuild the stats counters from the collection, a page at a time"""
+        return self.stats.recompute(self.collection, page_size or settings.collection_page_size)
+    
+    def disk_usage_bytes(self) -> int:
+        """Size of the persist directory, walked at most once per vector_disk_usage_ttl_seconds"""
+        measured_at, total = self._disk_usage
+        if time.monotonic() - measured_at < settings.vector_disk_usage_ttl_seconds:
+            return total
+        total = 0
+        for root, _, files in os.walk(self.persist_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass  # Removed while walking
+        self._disk_usage = (time.monotonic(), total)
+        return total
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get vector store statistics"""
-        count = self.collection.count()
-        # Note: Dimension check might need an actual embedding if not stored in metadata
-        # For now, we assume the configured model's dimension
+        """Get vector store statistics from the maintained counters"""
         return {
-            "total_vectors": count,
-            "total_documents": len(set(meta.get("document_id", 0) for meta in self.collection.get()['metadatas'])) if count > 0 else 0,
-            "embedding_model": settings.ollama_embedding_model
+            **self.stats.summary(),
+            "disk_usage_bytes": self.disk_usage_bytes(),
+            "search_mode": self.search_mode,
+            "lexical_index": self.lexical_index.stats() if self.lexical_index is not None else None,
+            "embedding_model": settings.ollama_embedding_model,
+            "embedding_cache": self.embedding_function.cache_stats()
         }
\ No newline at end of file
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+from app.core.logger import logger
+
+class VectorStats:
+    """Vector store statistics maintained as counters in a SQLite sidecar.
+
+    Per-document chunk counts and the embedding dimension are updated on
+    every add and delete, so reading them never scans the collection.
+    recompute() rebuilds them from the collection page by page when drift
+    is suspected.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS document_chunks ("
+            "document_id INTEGER PRIMARY KEY, chunks INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @property
+    def initialized(self) -> bool:
+        """False until counters have been built, e.g. for a collection created before them"""
+        return self._get_meta("initialized") == "1"
+
+    @property
+    def dimension(self) -> Optional[int]:
+        value = self._get_meta("dimension")
+        return int(value) if value else None
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def record_added(self, chunks_per_document: Dict[int, int], dimension: Optional[int] = None):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for document_id, chunks in chunks_per_document.items():
+                    self._conn.execute(
+                        "INSERT INTO document_chunks (document_id, chunks) VALUES (?, ?) "
+                        "ON CONFLICT(document_id) DO UPDATE SET chunks = chunks + excluded.chunks",
+                        (document_id, chunks)
+                    )
+                if dimension:
+                    self._set_meta("dimension", dimension)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def record_removed(self, chunks_per_document: Dict[int, int]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for document_id, chunks in chunks_per_document.items():
+                    self._conn.execute(
+                        "UPDATE document_chunks SET chunks = chunks - ? WHERE document_id = ?",
+                        (chunks, document_id)
+                    )
+                self._conn.execute("DELETE FROM document_chunks WHERE chunks <= 0")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def record_document_removed(self, document_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM document_chunks WHERE document_id = ?", (document_id,))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            documents, vectors = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM document_chunks"
+            ).fetchone()
+        return {"total_vectors": vectors, "total_documents": documents, "embedding_dimension": self.dimension}
+
+    def document_chunks(self, document_id: int) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks FROM document_chunks WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def recompute(self, collection, page_size: int) -> Dict[str, Any]:
+        """Rebuild the counters by paging through the collection's metadata.
+
+        Returns the new summary along with the counts it replaced, so drift
+        can be reported.
+        """
+        before = self.summary() if self.initialized else None
+        counts: Counter = Counter()
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            counts.update(meta.get("document_id", 0) for meta in page["metadatas"])
+            offset += len(page["ids"])
+
+        sample = collection.get(include=["embeddings"], limit=1)
+        dimension = len(sample["embeddings"][0]) if len(sample["ids"]) else None
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM document_chunks")
+                self._conn.executemany(
+                    "INSERT INTO document_chunks (document_id, chunks) VALUES (?, ?)", counts.items()
+                )
+                if dimension:
+                    self._set_meta("dimension", dimension)
+                self._set_meta("initialized", 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        after = self.summary()
+        logger.info(f"Recomputed vector stats: {after['total_vectors']} vectors in {after['total_documents']} documents")
+        return {**after, "previous": before}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
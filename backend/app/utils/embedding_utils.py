@@ -1,29 +1,97 @@
 from langchain_community.embeddings import OllamaEmbeddings
 from chromadb import Documents, EmbeddingFunction, Embeddings
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import settings
-from typing import List
+from app.utils.embedding_cache import EmbeddingCache
+from typing import Any, Dict, List, Optional
+import numpy as np
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 class ChromaOllamaEmbeddingFunction(EmbeddingFunction):
-    def __init__(self):
+    def __init__(
+        self,
+        batch_size: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None,
+        retry_backoff: float = None,
+        cache: Optional[EmbeddingCache] = None
+    ):
         logger.info("Initializing ChromaOllamaEmbeddingFunction")
         self._model = OllamaEmbeddings(
             model=settings.ollama_embedding_model,
-            base_url="http://localhost:11434"
+            base_url=settings.ollama_base_url
+        )
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.max_retries = settings.embedding_max_retries if max_retries is None else max_retries
+        self.retry_backoff = settings.embedding_retry_backoff_seconds if retry_backoff is None else retry_backoff
+        self.cache = cache
+        max_concurrency = max_concurrency or settings.embedding_max_concurrency
+        # Held around every request, whether its batch runs in the pool or
+        # inline in the caller's thread, so it bounds the number of in-flight
+        # requests to the embedding backend for the whole process
+        self._request_slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="embedding"
         )
 
     def __call__(self, input: Documents) -> Embeddings:
-        # ChromaDB calls this
-        results = self._model.embed_documents(input)
-        # Force conversion to list of lists of floats
-        return [[float(x) for x in (r.tolist() if hasattr(r, 'tolist') else r)] for r in results]
+        # ChromaDB calls this; it accepts float32 rows as-is
+        return list(self.embed_texts(list(input)))
 
-    def embed_documents(self, input: List[str]) -> List[List[float]]:
+    def embed_documents(self, input: List[str]) -> np.ndarray:
         # DocumentProcessor calls this
-        results = self._model.embed_documents(input)
-        return [[float(x) for x in (r.tolist() if hasattr(r, 'tolist') else r)] for r in results]
+        return self.embed_texts(input)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, serving repeats from the cache when one is configured.
+
+        Returns a float32 array of shape (len(texts), dimension).
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        cached = self.cache.get_many(texts)
+        # Embed each distinct missing text once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            fresh = self._embed_uncached(missing)
+            self.cache.put_many(missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            cached = [vector if vector is not None else by_text[text] for text, vector in zip(texts, cached)]
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in batches, running up to max_concurrency batches at once."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        logger.info(f"Embedding {len(texts)} texts in {len(batches)} batches")
+        return np.vstack(list(self._executor.map(self._embed_batch, batches)))
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch, retrying transient failures with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._request_slots:
+                    return np.asarray(self._model.embed_documents(texts), dtype=np.float32)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"Embedding batch of {len(texts)} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.cache.stats() if self.cache is not None else None
 
     def name(self) -> str:
         return "ollama_embeddings"
@@ -36,7 +104,14 @@ def get_embeddings():
     global _chroma_embedding_instance
     if _chroma_embedding_instance is None:
         logger.info("Creating new embedding function instance")
-        _chroma_embedding_instance = ChromaOllamaEmbeddingFunction()
+        cache = None
+        if settings.embedding_cache_enabled:
+            cache = EmbeddingCache(
+                path=settings.embedding_cache_path,
+                model=settings.ollama_embedding_model,
+                max_entries=settings.embedding_cache_max_entries
+            )
+        _chroma_embedding_instance = ChromaOllamaEmbeddingFunction(cache=cache)
     else:
         logger.info("Returning existing embedding function instance")
-    return _chroma_embedding_instance
\ No newline at end of file
+    return _chroma_embedding_instance
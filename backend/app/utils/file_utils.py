@@ -1,8 +1,146 @@
 import PyPDF2
 from docx import Document as DocxDocument
 from unstructured.partition.auto import partition
+import asyncio
+import contextlib
 import io
-from typing import List, Dict, Any
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.logger import logger
+
+class ParsingTimeout(Exception):
+    """Raised when a file takes longer than the parsing timeout to parse."""
+
+class ParsingExecutor:
+    """Process pool running the CPU-bound parsing in this module.
+    
+    PyPDF2, python-docx and unstructured hold the GIL for the whole parse,
+    so running them in the server process stalls every other request. The
+    pool is started on first use. Workers report when they pick a task up,
+    so the timeout only counts the parse itself, not waiting for a free
+    worker or for one to start. A parse that outlives it cannot be
+    interrupted: its worker is killed and the pool replaced. Killing a
+    worker breaks the old pool, so tasks it was still running are resubmitted
+    to the new one.
+    """
+    
+    def __init__(self, workers: int = None, timeout: float = None):
+        self.workers = workers or settings.parse_process_workers
+        self.timeout = timeout or settings.parse_timeout_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._started = None
+        self._task_ids = itertools.count()
+        # Task id -> (loop, future) resolved with the worker's pid when the task starts
+        self._waiting: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._started = context.SimpleQueue()
+            # Spawned workers avoid forking a process that already runs threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._started,)
+            )
+            threading.Thread(target=self._dispatch_starts, args=(self._started,), daemon=True).start()
+        return self._pool
+    
+    def _dispatch_starts(self, started):
+        while (item := started.get()) is not None:
+            task_id, pid = item
+            waiting = self._waiting.pop(task_id, None)
+            if waiting:
+                loop, future = waiting
+                loop.call_soon_threadsafe(lambda f=future, p=pid: f.done() or f.set_result(p))
+    
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        task_id = next(self._task_ids)
+        started = loop.create_future()
+        self._waiting[task_id] = (loop, started)
+        future = loop.run_in_executor(pool, _run_reporting_start, task_id, fn, *args)
+        try:
+            await asyncio.wait({started, future}, return_when=asyncio.FIRST_COMPLETED)
+            if not future.done():
+                await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            return future.result()
+        except asyncio.TimeoutError:
+            logger.warning(f"{fn.__name__} timed out after {self.timeout}s, killing its worker and replacing the parsing pool")
+            self._retire(pool)
+            if not future.done():
+                # Fails with BrokenProcessPool once the worker is gone
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(started.result(), signal.SIGTERM)
+            raise ParsingTimeout(f"Parsing timed out after {self.timeout:g}s")
+        except BrokenProcessPool:
+            if pool is not self._pool:
+                # Another task's timeout killed a worker of this pool
+                return await self.run(fn, *args)
+            # A worker died, e.g. a parser crashed the interpreter
+            self._retire(pool)
+            raise
+        finally:
+            self._waiting.pop(task_id, None)
+    
+    def _retire(self, pool: ProcessPoolExecutor):
+        if pool is self._pool:
+            self.shutdown()
+    
+    def shutdown(self):
+        if self._pool is not None:
+            # Tasks already in the old pool still complete, or fail over to a new one
+            threading.Thread(target=self._close, args=(self._pool, self._started), daemon=True).start()
+            self._pool = None
+    
+    @staticmethod
+    def _close(pool: ProcessPoolExecutor, started):
+        pool.shutdown(wait=True)
+        started.put(None)
+
+# In pool workers: the queue their tasks report starting on
+_started = None
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+def _run_reporting_start(task_id: int, fn: Callable, *args: Any) -> Any:
+    _started.put((task_id, os.getpid()))
+    return fn(*args)
+
+_parsing_executor = None
+
+def get_parsing_executor() -> ParsingExecutor:
+    global _parsing_executor
+    if _parsing_executor is None:
+        _parsing_executor = ParsingExecutor()
+    return _parsing_executor
+
+# Synchronous extractors, kept at module level so they can run in the pool.
+# Text is assembled with join: repeated += copies the text for every page.
+
+def pdf_text(file_content: bytes) -> str:
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+    return "".join((page.extract_text() or "") + "\n" for page in pdf_reader.pages)
+
+def docx_text(file_content: bytes) -> str:
+    doc = DocxDocument(io.BytesIO(file_content))
+    return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
+
+def unstructured_text(file_content: bytes) -> str:
+    elements = partition(file=io.BytesIO(file_content))
+    return "\n".join(str(element) for element in elements)
 
 async def process_document(file_content: bytes, filename: str) -> List[Dict[str, Any]]:
     """Process document and return chunks for embedding"""
@@ -20,54 +158,33 @@ async def process_document(file_content: bytes, filename: str) -> List[Dict[str,
         return await process_with_unstructured(file_content)
 
 async def extract_text_content(file_content: bytes, filename: str) -> str:
-    """Extract raw text content from document for viewing"""
+    """Extract raw text content from document for viewing; parsing errors, including ParsingTimeout, are raised"""
     
     file_extension = filename.lower().split('.')[-1]
     
-    try:
-        if file_extension == 'pdf':
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        elif file_extension == 'docx':
-            doc = DocxDocument(io.BytesIO(file_content))
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        elif file_extension == 'txt':
+    if file_extension == 'pdf':
+        return await get_parsing_executor().run(pdf_text, file_content)
+    elif file_extension == 'docx':
+        return await get_parsing_executor().run(docx_text, file_content)
+    elif file_extension == 'txt':
+        return file_content.decode('utf-8')
+    elif file_extension in ['jpg', 'jpeg', 'png', 'gif']:
+        return f"[Image file: {filename}]\nImage content cannot be displayed as text."
+    else:
+        # Try to decode as text
+        try:
             return file_content.decode('utf-8')
-        elif file_extension in ['jpg', 'jpeg', 'png', 'gif']:
-            return f"[Image file: {filename}]\nImage content cannot be displayed as text."
-        else:
-            # Try to decode as text
-            try:
-                return file_content.decode('utf-8')
-            except:
-                return f"[Binary file: {filename}]\nContent cannot be displayed as text."
-    except Exception as e:
-        return f"Error reading file content: {str(e)}"
+        except:
+            return f"[Binary file: {filename}]\nContent cannot be displayed as text."
 
 async def process_pdf(file_content: bytes) -> List[Dict[str, Any]]:
     """Extract text from PDF and chunk it"""
-    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-    text = ""
-    
-    for page in pdf_reader.pages:
-        text += page.extract_text() + "\n"
-    
+    text = await get_parsing_executor().run(pdf_text, file_content)
     return chunk_text(text)
 
 async def process_docx(file_content: bytes) -> List[Dict[str, Any]]:
     """Extract text from DOCX and chunk it"""
-    doc = DocxDocument(io.BytesIO(file_content))
-    text = ""
-    
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-    
+    text = await get_parsing_executor().run(docx_text, file_content)
     return chunk_text(text)
 
 async def process_text(file_content: bytes) -> List[Dict[str, Any]]:
@@ -78,8 +195,7 @@ async def process_text(file_content: bytes) -> List[Dict[str, Any]]:
 async def process_with_unstructured(file_content: bytes) -> List[Dict[str, Any]]:
     """Use unstructured library for other formats"""
     try:
-        elements = partition(file=io.BytesIO(file_content))
-        text = "\n".join([str(element) for element in elements])
+        text = await get_parsing_executor().run(unstructured_text, file_content)
         return chunk_text(text)
     except Exception:
         # Fallback to treating as text
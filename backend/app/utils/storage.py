@@ -1,15 +1,54 @@
 import aiofiles
+import aiofiles.os
+import asyncio
+import hashlib
+import io
 import os
+import shutil
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, BinaryIO, Optional
 from app.core.config import settings
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 from azure.storage.blob.aio import BlobServiceClient
 
+def extracted_text_path(file_path: str) -> str:
+    """Where the gzip-compressed text extracted from a stored file is kept, next to the file"""
+    return f"{file_path}.txt.gz"
+
+class HashingReader:
+    """Wraps a readable file, hashing and counting bytes as they are read.
+
+    Deliberately not seekable, so readers such as boto3's multipart upload
+    consume it once, in order.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._sha256.update(data)
+        self.size += len(data)
+        return data
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
 class StorageService(ABC):
     @abstractmethod
     async def store_file(self, file_path: str, content: bytes) -> str:
         pass
     
+    @abstractmethod
+    async def store_fileobj(self, file_path: str, fileobj: BinaryIO) -> str:
+        """Store a file read from fileobj in chunks, never holding it in memory"""
+        pass
+    
     @abstractmethod
     async def get_file(self, file_path: str) -> bytes:
         pass
@@ -18,14 +57,29 @@ class StorageService(ABC):
     async def delete_file(self, file_path: str) -> bool:
         pass
     
+    @abstractmethod
+    async def get_size(self, file_path: str) -> int:
+        """Size in bytes; raises FileNotFoundError for a missing file"""
+        pass
+    
+    @abstractmethod
+    def iter_file(self, file_path: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream length bytes from offset start (to the end by default) in chunks"""
+        pass
+    
+    def local_path(self, file_path: str) -> Optional[str]:
+        """Filesystem path of the file when the backend has one, so it can be served without copying"""
+        return None
+    
     @property
     @abstractmethod
     def storage_type(self) -> str:
         pass
 
 class LocalStorageService(StorageService):
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, chunk_size: int = 1024 * 1024):
         self.base_path = base_path
+        self.chunk_size = chunk_size
         os.makedirs(base_path, exist_ok=True)
     
     async def store_file(self, file_path: str, content: bytes) -> str:
@@ -36,6 +90,16 @@ class LocalStorageService(StorageService):
             await f.write(content)
         return file_path
     
+    async def store_fileobj(self, file_path: str, fileobj: BinaryIO) -> str:
+        full_path = os.path.join(self.base_path, file_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        
+        def copy():
+            with open(full_path, 'wb') as f:
+                shutil.copyfileobj(fileobj, f, self.chunk_size)
+        await asyncio.to_thread(copy)
+        return file_path
+    
     async def get_file(self, file_path: str) -> bytes:
         full_path = os.path.join(self.base_path, file_path)
         if not os.path.exists(full_path):
@@ -51,33 +115,88 @@ class LocalStorageService(StorageService):
         except:
             return False
     
+    async def get_size(self, file_path: str) -> int:
+        return await aiofiles.os.path.getsize(os.path.join(self.base_path, file_path))
+    
+    async def iter_file(self, file_path: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        full_path = os.path.join(self.base_path, file_path)
+        async with aiofiles.open(full_path, 'rb') as f:
+            await f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = await f.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    
+    def local_path(self, file_path: str) -> Optional[str]:
+        full_path = os.path.join(self.base_path, file_path)
+        return full_path if os.path.isfile(full_path) else None
+    
     @property
     def storage_type(self) -> str:
         return "local"
 
+def _is_missing(error: ClientError) -> bool:
+    return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
 class S3StorageService(StorageService):
-    def __init__(self, bucket_name: str, region: str):
+    """S3 (or an S3-compatible endpoint such as MinIO) storage.
+
+    boto3 is synchronous, so every call runs in a worker thread instead of
+    blocking the event loop. Uploads go through upload_fileobj, which
+    switches to parallel multipart uploads above multipart_chunk_size, and
+    reads stream the object body in chunks, using Range requests for
+    partial reads.
+    """
+
+    def __init__(self, bucket_name: str, region: str, endpoint_url: Optional[str] = None,
+                 chunk_size: int = 1024 * 1024, multipart_chunk_size: int = 8 * 1024 * 1024):
         self.bucket_name = bucket_name
-        self.s3_client = boto3.client('s3', region_name=region)
+        self.chunk_size = chunk_size
+        self.s3_client = boto3.client('s3', region_name=region, endpoint_url=endpoint_url)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_chunk_size,
+            multipart_chunksize=multipart_chunk_size
+        )
     
     async def store_file(self, file_path: str, content: bytes) -> str:
-        self.s3_client.put_object(
-            Bucket=self.bucket_name,
-            Key=file_path,
-            Body=content
+        await asyncio.to_thread(
+            self.s3_client.upload_fileobj,
+            io.BytesIO(content),
+            self.bucket_name,
+            file_path,
+            Config=self.transfer_config
         )
         return file_path
     
-    async def get_file(self, file_path: str) -> bytes:
-        response = self.s3_client.get_object(
-            Bucket=self.bucket_name,
-            Key=file_path
+    async def store_fileobj(self, file_path: str, fileobj: BinaryIO) -> str:
+        await asyncio.to_thread(
+            self.s3_client.upload_fileobj,
+            fileobj,
+            self.bucket_name,
+            file_path,
+            Config=self.transfer_config
         )
-        return response['Body'].read()
+        return file_path
+    
+    async def get_file(self, file_path: str) -> bytes:
+        def read() -> bytes:
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_path)
+            except ClientError as e:
+                if _is_missing(e):
+                    raise FileNotFoundError(f"File not found: {file_path}") from e
+                raise
+            return response['Body'].read()
+        return await asyncio.to_thread(read)
     
     async def delete_file(self, file_path: str) -> bool:
         try:
-            self.s3_client.delete_object(
+            await asyncio.to_thread(
+                self.s3_client.delete_object,
                 Bucket=self.bucket_name,
                 Key=file_path
             )
@@ -85,6 +204,36 @@ class S3StorageService(StorageService):
         except:
             return False
     
+    async def get_size(self, file_path: str) -> int:
+        try:
+            response = await asyncio.to_thread(self.s3_client.head_object, Bucket=self.bucket_name, Key=file_path)
+        except ClientError as e:
+            if _is_missing(e):
+                raise FileNotFoundError(f"File not found: {file_path}") from e
+            raise
+        return response['ContentLength']
+    
+    async def iter_file(self, file_path: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        params = {"Bucket": self.bucket_name, "Key": file_path}
+        if start or length is not None:
+            end = "" if length is None else start + length - 1
+            params["Range"] = f"bytes={start}-{end}"
+        try:
+            response = await asyncio.to_thread(self.s3_client.get_object, **params)
+        except ClientError as e:
+            if _is_missing(e):
+                raise FileNotFoundError(f"File not found: {file_path}") from e
+            raise
+        body = response['Body']
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+    
     @property
     def storage_type(self) -> str:
         return "s3"
@@ -95,13 +244,16 @@ def get_storage_service() -> StorageService:
     global _storage_service
     if _storage_service is None:
         if settings.storage_type == "local":
-            _storage_service = LocalStorageService(settings.storage_path)
+            _storage_service = LocalStorageService(settings.storage_path, settings.storage_chunk_size)
         elif settings.storage_type == "s3":
             _storage_service = S3StorageService(
                 settings.aws_bucket_name, 
-                settings.aws_region
+                settings.aws_region,
+                endpoint_url=settings.aws_endpoint_url,
+                chunk_size=settings.storage_chunk_size,
+                multipart_chunk_size=settings.s3_multipart_chunk_size
             )
         else:
-            _storage_service = LocalStorageService(settings.storage_path)
+            _storage_service = LocalStorageService(settings.storage_path, settings.storage_chunk_size)
     
     return _storage_service
\ No newline at end of file
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Recall and latency benchmark for vector-only versus hybrid retrieval.
+
+Indexes a synthetic corpus of support notes, each mentioning an error code
+and a part number, into a throwaway Chroma directory using the configured
+embedding model. Then asks two kinds of questions: exact identifier lookups
+("What does E40213 mean?") and descriptive ones naming the component and
+symptom. Reports recall@k and p50/p95 latency for each search mode.
+
+    python -m benchmarks.hybrid_retrieval --docs 500 --queries 100 --top-k 5
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import numpy as np
+from app.services.vector_service import VectorService
+
+COMPONENTS = ["pump", "controller", "sensor", "valve", "compressor", "inverter", "fan", "heater", "relay", "display"]
+SYMPTOMS = [
+    "overheats after a few minutes", "does not power on", "makes a grinding noise",
+    "reports a pressure drop", "restarts randomly", "shows a blank screen",
+    "leaks fluid", "drains the battery", "loses calibration", "trips the breaker"
+]
+REMEDIES = [
+    "replace the seal kit", "update the firmware", "reseat the ribbon cable",
+    "clean the intake filter", "recalibrate from the service menu", "swap the fuse",
+    "tighten the mounting bolts", "reset to factory defaults"
+]
+
+def build_corpus(docs: int, rng: random.Random):
+    notes = []
+    for i in range(docs):
+        component = rng.choice(COMPONENTS)
+        symptom = rng.choice(SYMPTOMS)
+        notes.append({
+            "code": f"E{rng.randint(10000, 99999)}",
+            "part": f"PN-{rng.randint(1000, 9999)}-{rng.choice('ABCDEFGH')}{rng.choice('KLMNPQRS')}",
+            "component": component,
+            "symptom": symptom,
+            "text": None
+        })
+        note = notes[-1]
+        note["text"] = (
+            f"Service note {i}. When the {component} {symptom}, the unit logs error {note['code']}. "
+            f"Technicians should {rng.choice(REMEDIES)} and, if the fault persists, order part "
+            f"{note['part']}."
+        )
+    return notes
+
+def build_queries(notes, count: int, rng: random.Random):
+    queries = []
+    for index in rng.sample(range(len(notes)), min(count, len(notes))):
+        note = notes[index]
+        queries.append(("identifier", f"What does error {note['code']} mean?", index))
+        queries.append(("identifier", f"Where is part {note['part']} used?", index))
+        queries.append(("descriptive", f"The {note['component']} {note['symptom']}, what should I do?", index))
+    return queries
+
+def run(service: VectorService, queries, mode: str, top_k: int):
+    hits = {}
+    latencies = []
+    for kind, query, expected in queries:
+        start = time.perf_counter()
+        results = service.search(query, top_k, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        found = any(result["chunk_id"] == expected for result in results)
+        total, hit = hits.get(kind, (0, 0))
+        hits[kind] = (total + 1, hit + int(found))
+    return hits, latencies
+
+def main(docs: int, queries: int, top_k: int, seed: int):
+    rng = random.Random(seed)
+    notes = build_corpus(docs, rng)
+    with tempfile.TemporaryDirectory() as persist_dir:
+        service = VectorService(persist_dir=persist_dir, search_mode="hybrid")
+        texts = [note["text"] for note in notes]
+        start = time.perf_counter()
+        embeddings = service.embedding_function.embed_texts(texts)
+        service.add_document_vectors(
+            np.asarray(embeddings, dtype=np.float32),
+            [{"text": text, "document_id": 1, "chunk_id": i, "source": "benchmark"} for i, text in enumerate(texts)]
+        )
+        print(f"Indexed {docs} chunks in {time.perf_counter() - start:.2f}s")
+
+        workload = build_queries(notes, queries, rng)
+        # Warm the query embedding cache so both modes pay the same embedding cost
+        service.embedding_function.embed_texts([query for _, query, _ in workload])
+
+        for mode in ("vector", "hybrid"):
+            hits, latencies = run(service, workload, mode, top_k)
+            recall = ", ".join(
+                f"{kind} recall@{top_k}={hit / total:.2f}" for kind, (total, hit) in sorted(hits.items())
+            )
+            p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+            print(
+                f"{mode:<7} {recall}  latency p50={statistics.median(latencies) * 1000:.1f}ms "
+                f"p95={p95 * 1000:.1f}ms"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.docs, args.queries, args.top_k, args.seed)
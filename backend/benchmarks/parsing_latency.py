@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Event loop latency while documents are parsed inline or in the parsing pool.
+
+Parses a corpus of PDF and DOCX files concurrently, first by calling the
+extractors directly from coroutines (the old code path) and then through
+extract_text_content, which runs them in the process pool. A heartbeat
+task measures how late the loop wakes it up; inline parsing stalls it for
+as long as a whole file takes, the pool should keep it flat.
+
+Without --corpus, synthetic PDFs and DOCX files are generated.
+
+    python -m benchmarks.parsing_latency --corpus samples/ --rounds 3
+    python -m benchmarks.parsing_latency --files 8 --pages 200 --workers 4
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+from docx import Document as DocxDocument
+from app.utils.file_utils import ParsingExecutor, docx_text, extract_text_content, pdf_text
+import app.utils.file_utils as file_utils
+
+EXTRACTORS = {"pdf": pdf_text, "docx": docx_text}
+
+def make_pdf(pages: int, lines: int) -> bytes:
+    """A minimal PDF of Helvetica text lines, written by hand to avoid a PDF writer dependency"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = " ".join(
+            f"BT /F1 10 Tf 40 {780 - 14 * line} Td (Page {page} line {line}: the refund policy allows returns.) Tj ET"
+            for line in range(lines)
+        )
+        objects.append(f"<< /Length {len(text)} >>\nstream\n{text}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+def make_docx(paragraphs: int) -> bytes:
+    doc = DocxDocument()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i}: shipping takes five days and the warranty lasts two years.")
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+def load_corpus(args):
+    """(filename, bytes) pairs from --corpus, or generated ones"""
+    if args.corpus:
+        corpus = []
+        for name in sorted(os.listdir(args.corpus)):
+            if name.lower().rsplit(".", 1)[-1] in EXTRACTORS:
+                with open(os.path.join(args.corpus, name), "rb") as f:
+                    corpus.append((name, f.read()))
+        if not corpus:
+            raise SystemExit(f"No PDF or DOCX files in {args.corpus}")
+        return corpus
+    corpus = []
+    for i in range(args.files):
+        if i % 2 == 0:
+            corpus.append((f"sample{i}.pdf", make_pdf(args.pages, 40)))
+        else:
+            corpus.append((f"sample{i}.docx", make_docx(args.pages * 40)))
+    return corpus
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.005) -> list:
+    """Delays between scheduled and actual wake-ups, in seconds."""
+    delays = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        delays.append(loop.time() - expected)
+    return delays
+
+async def parse_inline(name: str, content: bytes) -> str:
+    # Old behaviour: synchronous parsing inside a coroutine
+    return EXTRACTORS[name.lower().rsplit(".", 1)[-1]](content)
+
+async def parse_pooled(name: str, content: bytes) -> str:
+    return await extract_text_content(content, name)
+
+async def measure(label: str, parse, corpus, rounds: int):
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    texts = await asyncio.gather(*(parse(name, content) for _ in range(rounds) for name, content in corpus))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    delays = sorted(await beat)
+    p99 = delays[int(len(delays) * 0.99) - 1] if len(delays) > 1 else delays[-1]
+    print(f"{label:<7} files={len(texts)} chars={sum(map(len, texts))} wall={elapsed:.2f}s "
+          f"loop_delay p50={statistics.median(delays) * 1000:.1f}ms p99={p99 * 1000:.1f}ms "
+          f"max={delays[-1] * 1000:.0f}ms")
+
+async def main(args):
+    corpus = load_corpus(args)
+    size_mb = sum(len(content) for _, content in corpus) / 1e6
+    print(f"[INFO] {len(corpus)} files, {size_mb:.1f} MB, {args.rounds} rounds, {args.workers} workers")
+
+    file_utils._parsing_executor = ParsingExecutor(workers=args.workers, timeout=args.timeout)
+    try:
+        # Start the workers before timing; spawning them is a one-off cost
+        await asyncio.gather(*(parse_pooled(*corpus[0]) for _ in range(args.workers)))
+        await measure("inline", parse_inline, corpus, args.rounds)
+        await measure("pool", parse_pooled, corpus, args.rounds)
+    finally:
+        file_utils._parsing_executor.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="Directory of sample PDF and DOCX files")
+    parser.add_argument("--files", type=int, default=8, help="Generated files when no corpus is given")
+    parser.add_argument("--pages", type=int, default=50, help="Pages per generated PDF (x40 paragraphs per DOCX)")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for SimpleOllama streaming.
+
+Starts a fake Ollama server that streams NDJSON tokens with a fixed delay,
+then runs N parallel streams through the blocking `stream` generator (the
+old code path) and through the async `astream` transport. Reports wall time
+and the worst event loop stall seen by a heartbeat task.
+
+    python -m benchmarks.stream_concurrency --streams 8 --tokens 20 --delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from app.services.enhanced_rag_service import SimpleOllama
+
+async def fake_ollama(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, tokens: int, delay: float):
+    try:
+        while True:
+            # Read request line and headers, then the JSON body
+            headers = {}
+            line = await reader.readline()
+            if not line:
+                return
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = json.loads(await reader.readexactly(int(headers.get("content-length", 0))) or b"{}")
+
+            if not body.get("stream"):
+                await asyncio.sleep(delay * tokens)
+                payload = json.dumps({"response": "token " * tokens, "done": True}).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n")
+                writer.write(f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                continue
+
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for i in range(tokens):
+                await asyncio.sleep(delay)
+                chunk = json.dumps({"response": f"t{i} ", "done": False}).encode() + b"\n"
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()
+            chunk = json.dumps({"response": "", "done": True}).encode() + b"\n"
+            writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n0\r\n\r\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+def start_fake_ollama(tokens: int, delay: float) -> int:
+    """Serve the fake backend from its own thread and event loop.
+
+    The blocking client stalls the benchmark loop, so the server must not
+    share it.
+    """
+    ready = threading.Event()
+    port = []
+
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: fake_ollama(r, w, tokens, delay), "127.0.0.1", 0
+        )
+        port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+    return port[0]
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Return the largest delay between scheduled and actual wake-ups."""
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - expected)
+    return worst
+
+async def run_blocking(llm: SimpleOllama, streams: int):
+    async def one():
+        # Old behaviour: a sync generator iterated inside an async function
+        return sum(1 for _ in llm.stream("hello"))
+    return await asyncio.gather(*(one() for _ in range(streams)))
+
+async def run_async(llm: SimpleOllama, streams: int):
+    async def one():
+        count = 0
+        async for _ in llm.astream("hello"):
+            count += 1
+        return count
+    return await asyncio.gather(*(one() for _ in range(streams)))
+
+async def measure(label: str, runner, llm: SimpleOllama, streams: int):
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stop))
+    start = time.perf_counter()
+    counts = await runner(llm, streams)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    stall = await beat
+    print(f"{label:<10} streams={streams} tokens={sum(counts)} wall={elapsed:.2f}s max_loop_stall={stall * 1000:.0f}ms")
+    return elapsed
+
+async def main(streams: int, tokens: int, delay: float):
+    port = start_fake_ollama(tokens, delay)
+    llm = SimpleOllama(base_url=f"http://127.0.0.1:{port}", model="bench", max_concurrency=streams)
+    single = tokens * delay
+    print(f"Single stream lower bound: {single:.2f}s")
+    try:
+        blocking = await measure("blocking", run_blocking, llm, streams)
+        pooled = await measure("async", run_async, llm, streams)
+        print(f"Speedup: {blocking / pooled:.1f}x (ideal {streams}x)")
+    finally:
+        await llm.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.streams, args.tokens, args.delay))
@@ -0,0 +1,52 @@
+import hashlib
+import os
+import tempfile
+
+# Settings are read on import, so the test environment is set up before any app module loads
+_workspace = tempfile.mkdtemp(prefix="aidemo-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite+aiosqlite:///{_workspace}/test.sqlite3",
+    CHROMA_DB_PATH=os.path.join(_workspace, "chromadb"),
+    STORAGE_TYPE="local",
+    STORAGE_PATH=os.path.join(_workspace, "documents"),
+    EMBEDDING_CACHE_ENABLED="false",
+    DEBUG="false",
+)
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from langchain_community.embeddings import OllamaEmbeddings
+
+import app.models  # noqa: F401  registers the tables
+from app.core.database import AsyncSessionLocal, Base, engine
+
+
+@pytest.fixture
+def embedded_texts(monkeypatch):
+    """Replace Ollama with a deterministic bag-of-words embedding; yields every text embedded"""
+    texts = []
+
+    def embed_documents(self, batch):
+        texts.extend(batch)
+        vectors = []
+        for text in batch:
+            vector = np.zeros(64, dtype=np.float32)
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+            vectors.append((vector / (np.linalg.norm(vector) or 1)).tolist())
+        return vectors
+
+    monkeypatch.setattr(OllamaEmbeddings, "embed_documents", embed_documents)
+    return texts
+
+
+@pytest_asyncio.fixture
+async def db():
+    """A session on freshly created tables"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        yield session
+    await engine.dispose()
@@ -0,0 +1,79 @@
+import pytest
+
+from app.core.database import AsyncSessionLocal
+from app.models.document import Document
+from app.schemas.processing_status import ProcessingStage
+from app.services.document_service import DocumentService
+from app.services.ingestion_queue import IngestionQueue
+from app.utils.storage import get_storage_service
+
+
+class RecordingRAGService:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_document(self, document_id: int):
+        self.deleted.append(document_id)
+
+
+@pytest.fixture
+async def queue(monkeypatch):
+    """A running queue whose jobs are recorded instead of processed"""
+    queue = IngestionQueue(rag_service=None, storage=get_storage_service(), workers=1)
+    queue.jobs = []
+
+    async def process(job):
+        queue.jobs.append(job.document_id)
+
+    monkeypatch.setattr(queue, "_process", process)
+    await queue.start()
+    yield queue
+    await queue.stop()
+
+
+@pytest.fixture
+async def owner_and_duplicates(db):
+    owner = Document(filename="a.txt", file_path="a.txt", file_size=1, status=ProcessingStage.COMPLETED.value)
+    db.add(owner)
+    await db.commit()
+    duplicates = [
+        Document(filename=name, file_path=name, file_size=1, status=ProcessingStage.COMPLETED.value,
+                 vector_collection_id=str(owner.id))
+        for name in ("b.txt", "c.txt")
+    ]
+    db.add_all(duplicates)
+    await db.commit()
+    return owner.id, [duplicate.id for duplicate in duplicates]
+
+
+async def load(document_id: int) -> Document:
+    async with AsyncSessionLocal() as session:
+        return await session.get(Document, document_id)
+
+
+async def test_deleting_the_owner_hands_its_vectors_to_the_oldest_duplicate(db, queue, owner_and_duplicates):
+    owner_id, (successor_id, other_id) = owner_and_duplicates
+    rag_service = RecordingRAGService()
+
+    assert await DocumentService(db, rag_service=rag_service, ingestion_queue=queue).delete_document(owner_id)
+    await queue._queue.join()
+
+    assert await load(owner_id) is None
+    assert rag_service.deleted == [owner_id]
+    # The successor is re-indexed under its own id and the rest now share its vectors
+    assert queue.jobs == [successor_id]
+    successor = await load(successor_id)
+    assert successor.vector_collection_id is None
+    assert successor.status == ProcessingStage.UPLOADING
+    assert (await load(other_id)).vector_collection_id == str(successor_id)
+
+
+async def test_deleting_a_duplicate_keeps_the_shared_vectors(db, queue, owner_and_duplicates):
+    owner_id, (duplicate_id, other_id) = owner_and_duplicates
+    rag_service = RecordingRAGService()
+
+    assert await DocumentService(db, rag_service=rag_service, ingestion_queue=queue).delete_document(duplicate_id)
+
+    assert rag_service.deleted == []
+    assert queue.jobs == []
+    assert (await load(other_id)).vector_collection_id == str(owner_id)
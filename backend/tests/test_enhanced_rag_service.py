@@ -0,0 +1,54 @@
+import pytest
+from langchain_core.documents import Document as Chunk
+
+from app.services.document_processor import DocumentProcessor
+from app.services.enhanced_rag_service import EnhancedRAGService
+from app.services.vector_service import VectorService
+
+
+@pytest.fixture
+def rag_service(tmp_path, embedded_texts):
+    return EnhancedRAGService(
+        vector_service=VectorService(persist_dir=str(tmp_path / "chromadb")),
+        document_processor=DocumentProcessor(),
+        llm=object()
+    )
+
+
+def chunks(*texts):
+    return [Chunk(page_content=text) for text in texts]
+
+
+def stored(rag_service, document_id):
+    """(position, text) of each stored chunk, by vector id"""
+    return {
+        vector_id: (meta["chunk_id"], meta["text"])
+        for vector_id, meta in rag_service.vector_service.get_document_chunks(document_id).items()
+    }
+
+
+def test_sync_chunks_embeds_only_changed_chunks(rag_service, embedded_texts):
+    rag_service.sync_chunks(chunks("alpha one", "beta two", "gamma three"), 7, "v1.txt")
+    before = stored(rag_service, 7)
+    embedded_texts.clear()
+
+    result = rag_service.sync_chunks(chunks("alpha one", "gamma three", "delta four"), 7, "v2.txt")
+
+    assert result == {"added": 1, "removed": 1, "moved": 1, "unchanged": 1}
+    assert embedded_texts == ["delta four"]
+    after = stored(rag_service, 7)
+    assert sorted(after.values()) == [(0, "alpha one"), (1, "gamma three"), (2, "delta four")]
+    # Retained chunks keep their vectors, the new one gets a fresh id
+    retained = {vector_id for vector_id, (_, text) in before.items() if text != "beta two"}
+    assert retained < after.keys()
+    assert not (after.keys() - retained) & before.keys()
+
+
+def test_sync_chunks_without_changes_touches_nothing(rag_service, embedded_texts):
+    rag_service.sync_chunks(chunks("alpha one", "beta two"), 7, "v1.txt")
+    embedded_texts.clear()
+
+    result = rag_service.sync_chunks(chunks("alpha one", "beta two"), 7, "v2.txt")
+
+    assert result == {"added": 0, "removed": 0, "moved": 0, "unchanged": 2}
+    assert embedded_texts == []
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from app.models.document import Document
+from app.schemas.processing_status import ProcessingStage
+from app.services.ingestion_queue import IngestionQueue, utcnow
+
+
+def recording_queue(monkeypatch, jobs):
+    """A queue whose enqueued jobs are recorded instead of processed"""
+    queue = IngestionQueue(rag_service=None, storage=None)
+    monkeypatch.setattr(
+        queue, "enqueue",
+        lambda document_id, file_path, incremental=False, replaces=None: jobs.append((document_id, replaces))
+    )
+    return queue
+
+
+@pytest.fixture
+async def documents(db):
+    lapsed = utcnow() - timedelta(hours=1)
+    rows = {
+        "lapsed": Document(filename="a.txt", file_path="a.txt", file_size=1, status=ProcessingStage.UPLOADING.value,
+                           claimed_at=lapsed, superseded_paths="old-a.txt\nolder-a.txt"),
+        "fresh": Document(filename="b.txt", file_path="b.txt", file_size=1, status=ProcessingStage.PROCESSING.value,
+                          claimed_at=utcnow()),
+        "unclaimed": Document(filename="c.txt", file_path="c.txt", file_size=1, status=ProcessingStage.EMBEDDING.value),
+        "completed": Document(filename="d.txt", file_path="d.txt", file_size=1, status=ProcessingStage.COMPLETED.value,
+                              claimed_at=lapsed),
+    }
+    db.add_all(rows.values())
+    await db.commit()
+    return {name: row.id for name, row in rows.items()}
+
+
+async def test_recover_pending_takes_only_lapsed_claims(db, documents, monkeypatch):
+    jobs = []
+    queue = recording_queue(monkeypatch, jobs)
+
+    await queue._recover_pending()
+
+    assert jobs == [
+        (documents["lapsed"], ["old-a.txt", "older-a.txt"]),
+        (documents["unclaimed"], None),
+    ]
+    # Taking a document renews its claim, so the next pass leaves it alone
+    await queue._recover_pending()
+    assert len(jobs) == 2
+
+async def test_each_lapsed_document_is_recovered_once(db, documents, monkeypatch):
+    jobs = []
+    first, second = recording_queue(monkeypatch, jobs), recording_queue(monkeypatch, jobs)
+
+    await asyncio.gather(first._recover_pending(), second._recover_pending())
+    await first._recover_pending()
+
+    assert sorted(document_id for document_id, _ in jobs) == [documents["lapsed"], documents["unclaimed"]]
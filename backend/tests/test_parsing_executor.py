@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.utils.file_utils import ParsingExecutor, ParsingTimeout
+
+
+def sleep_and_report(seconds: float) -> int:
+    """Runs in a pool worker; returns the worker's pid"""
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.fixture
+def executor():
+    executor = ParsingExecutor(workers=1, timeout=0.5)
+    yield executor
+    executor.shutdown()
+
+
+async def test_timed_out_parse_kills_its_worker(executor):
+    pid = await executor.run(sleep_and_report, 0)
+
+    with pytest.raises(ParsingTimeout):
+        await executor.run(sleep_and_report, 30)
+
+    deadline = time.monotonic() + 10
+    while process_exists(pid) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    assert not process_exists(pid)
+
+    # The next parse runs in a fresh pool
+    new_pid = await executor.run(sleep_and_report, 0)
+    assert new_pid != pid
+
+
+async def test_time_waiting_for_a_worker_is_not_counted(executor):
+    await executor.run(sleep_and_report, 0)
+
+    # One worker: the last parse waits 0.8s for it, longer than the timeout
+    results = await asyncio.gather(*(executor.run(sleep_and_report, 0.4) for _ in range(3)))
+
+    assert len(set(results)) == 1
+
+
+async def test_parse_queued_behind_a_timed_out_one_is_resubmitted(executor):
+    await executor.run(sleep_and_report, 0)
+
+    stuck = asyncio.ensure_future(executor.run(sleep_and_report, 30))
+    await asyncio.sleep(0.1)
+    queued = asyncio.ensure_future(executor.run(sleep_and_report, 0.1))
+
+    with pytest.raises(ParsingTimeout):
+        await stuck
+    assert process_exists(await queued)
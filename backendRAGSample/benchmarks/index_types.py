@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Build time, memory, QPS and recall of FAISS index types against the flat baseline.
+
+Uses embeddings from a .npy file, the vectors of an existing flat index, or
+a synthetic clustered set shaped like all-MiniLM-L6-v2 output. Queries are
+held-out vectors; recall@k is measured against exact (flat) search. Each
+approximate index is swept over its query-time parameter.
+
+    python -m benchmarks.index_types --vectors 100000 --queries 1000 --top-k 10
+    python -m benchmarks.index_types --from-index faiss_store/faiss.index
+"""
+import argparse
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+from src.vectorstore import base_index, build_index, search_parameters
+
+def synthetic_embeddings(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype('float32')
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(n, dim)).astype('float32')
+    # Sentence embeddings are usually L2-normalized
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def load_embeddings(args) -> np.ndarray:
+    if args.embeddings:
+        return np.load(args.embeddings).astype('float32')
+    if args.from_index:
+        index = faiss.read_index(args.from_index)
+        # Rows of an id-mapped index are stored in insertion order
+        return base_index(index).reconstruct_n(0, index.ntotal)
+    return synthetic_embeddings(args.vectors + args.queries, args.dim)
+
+def index_bytes(index) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.index")
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def timed_search(index, queries: np.ndarray, top_k: int, params=None):
+    start = time.perf_counter()
+    if params is not None:
+        _, found = index.search(queries, top_k, params=params)
+    else:
+        _, found = index.search(queries, top_k)
+    return found, len(queries) / (time.perf_counter() - start)
+
+def main(args):
+    data = load_embeddings(args)
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(data))
+    n_queries = min(args.queries, len(data) // 10)
+    queries = np.ascontiguousarray(data[order[:n_queries]])
+    base = np.ascontiguousarray(data[order[n_queries:]])
+    print(f"[INFO] {len(base)} vectors of dimension {base.shape[1]}, {n_queries} queries, top_k={args.top_k}")
+
+    print(f"{'index':<10} {'param':<12} {'build_s':>8} {'size_MB':>8} {'QPS':>10} {'recall':>7}")
+    truth = None
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_index(base, index_type)
+        index.add_with_ids(base, np.arange(len(base), dtype="int64"))
+        build_seconds = time.perf_counter() - start
+        size_mb = index_bytes(index) / 1e6
+
+        if isinstance(base_index(index), faiss.IndexHNSW):
+            sweep = [("efSearch", value, search_parameters(index, 0, value)) for value in args.ef_search]
+        elif search_parameters(index, 1, 0) is not None:
+            sweep = [("nprobe", value, search_parameters(index, value, 0)) for value in args.nprobe]
+        else:
+            sweep = [("exact", "-", None)]
+
+        for name, value, params in sweep:
+            found, qps = timed_search(index, queries, args.top_k, params)
+            if truth is None and index_type == "flat":
+                truth = found
+            score = recall(found, truth) if truth is not None else float("nan")
+            param = f"{name}={value}" if value != "-" else name
+            print(f"{index_type:<10} {param:<12} {build_seconds:>8.2f} {size_mb:>8.1f} {qps:>10.0f} {score:>7.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--embeddings", help=".npy file of float32 embeddings")
+    parser.add_argument("--from-index", help="Read vectors back from an existing flat index")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Memory and recall of quantized FAISS storage, with and without float32 rescoring.
+
+Builds one index per quantization mode over the same vectors (see
+benchmarks.index_types for the embedding sources) and reports its
+serialized size, the reduction against float32 storage, QPS and recall@k
+against exact search. Each mode is swept over the rescore factor: a factor
+of r fetches r * top_k candidates and re-ranks them by exact distance to
+float32 vectors read from a memory-mapped file, as FaissVectorStore does.
+
+    python -m benchmarks.quantization --from-index faiss_store/faiss.index
+    python -m benchmarks.quantization --vectors 100000 --index-type hnsw --rescore 1 4
+"""
+import argparse
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+from benchmarks.index_types import index_bytes, load_embeddings, recall
+from src.vector_file import VectorFile
+from src.vectorstore import QUANTIZATIONS, build_index, rescore, search_parameters
+
+def main(args):
+    data = load_embeddings(args)
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(data))
+    n_queries = min(args.queries, len(data) // 10)
+    queries = np.ascontiguousarray(data[order[:n_queries]])
+    base = np.ascontiguousarray(data[order[n_queries:]])
+    ids = np.arange(len(base), dtype='int64')
+    print(f"[INFO] {len(base)} vectors of dimension {base.shape[1]}, {n_queries} queries, top_k={args.top_k}, "
+          f"index_type={args.index_type}")
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, args.top_k)
+    float32_mb = base.nbytes / 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vector_file = VectorFile(os.path.join(tmp, "vectors.f32"), base.shape[1])
+        vector_file.write(ids, base)
+
+        print(f"{'quantization':<13} {'rescore':>7} {'size_MB':>8} {'reduction':>9} {'QPS':>9} {'recall':>7} {'loss':>7}")
+        baseline = {}
+        for quantization in args.quantizations:
+            index = build_index(base, args.index_type, quantization=quantization)
+            index.add_with_ids(base, ids)
+            size_mb = index_bytes(index) / 1e6
+            params = search_parameters(index, args.nprobe, args.ef_search)
+
+            for factor in args.rescore:
+                start = time.perf_counter()
+                k = args.top_k * factor
+                if params is not None:
+                    _, found = index.search(queries, k, params=params)
+                else:
+                    _, found = index.search(queries, k)
+                if factor > 1:
+                    _, found = rescore(queries, found, vector_file.read, args.top_k)
+                qps = len(queries) / (time.perf_counter() - start)
+
+                score = recall(found[:, :args.top_k], truth)
+                if quantization == "none":
+                    baseline[factor] = score
+                loss = baseline[factor] - score if factor in baseline else float("nan")
+                print(f"{quantization:<13} {factor:>7} {size_mb:>8.1f} {float32_mb / size_mb:>8.1f}x "
+                      f"{qps:>9.0f} {score:>7.3f} {loss:>7.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--embeddings", help=".npy file of float32 embeddings")
+    parser.add_argument("--from-index", help="Read vectors back from an existing flat index")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf_flat", "hnsw"])
+    parser.add_argument("--quantizations", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    main(parser.parse_args())
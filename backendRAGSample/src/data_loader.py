@@ -1,103 +1,126 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Any
+from typing import Dict, Iterator, List, Any, Optional
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, CSVLoader
 from langchain_community.document_loaders import Docx2txtLoader
 from langchain_community.document_loaders.excel import UnstructuredExcelLoader
 from langchain_community.document_loaders import JSONLoader
 
-def load_all_documents(data_dir: str) -> List[Any]:
-    """
-    Load all supported files from the data directory and convert to LangChain document structure.
-    Supported: PDF, TXT, CSV, Excel, Word, JSON
-    """
-    # Use project root data folder
-    data_path = Path(data_dir).resolve()
-    print(f"[DEBUG] Data path: {data_path}")
-    documents = []
+LOADERS = {
+    ".pdf": PyPDFLoader,
+    ".txt": TextLoader,
+    ".csv": CSVLoader,
+    ".xlsx": UnstructuredExcelLoader,
+    ".docx": Docx2txtLoader,
+    ".json": JSONLoader,
+}
+
+@dataclass
+class FileLoadResult:
+    path: str
+    documents: List[Any] = field(default_factory=list)
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+def _load_file(path: str) -> FileLoadResult:
+    """Load one file; runs in a worker process, so failures are returned rather than raised"""
+    start = time.perf_counter()
+    try:
+        documents = LOADERS[Path(path).suffix.lower()](path).load()
+        return FileLoadResult(path, documents, time.perf_counter() - start)
+    except Exception as e:
+        return FileLoadResult(path, [], time.perf_counter() - start, f"{type(e).__name__}: {e}")
+
+def find_files(data_dir: str) -> List[str]:
+    """All supported files under data_dir, found in a single directory walk"""
+    files = []
+    for root, _, names in os.walk(Path(data_dir).resolve()):
+        for name in names:
+            if Path(name).suffix.lower() in LOADERS:
+                files.append(os.path.join(root, name))
+    return sorted(files)
 
-    # PDF files
-    pdf_files = list(data_path.glob('**/*.pdf'))
-    print(f"[DEBUG] Found {len(pdf_files)} PDF files: {[str(f) for f in pdf_files]}")
-    for pdf_file in pdf_files:
-        print(f"[DEBUG] Loading PDF: {pdf_file}")
-        try:
-            loader = PyPDFLoader(str(pdf_file))
-            loaded = loader.load()
-            print(f"[DEBUG] Loaded {len(loaded)} PDF docs from {pdf_file}")
-            documents.extend(loaded)
-        except Exception as e:
-            print(f"[ERROR] Failed to load PDF {pdf_file}: {e}")
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # TXT files
-    txt_files = list(data_path.glob('**/*.txt'))
-    print(f"[DEBUG] Found {len(txt_files)} TXT files: {[str(f) for f in txt_files]}")
-    for txt_file in txt_files:
-        print(f"[DEBUG] Loading TXT: {txt_file}")
-        try:
-            loader = TextLoader(str(txt_file))
-            loaded = loader.load()
-            print(f"[DEBUG] Loaded {len(loaded)} TXT docs from {txt_file}")
-            documents.extend(loaded)
-        except Exception as e:
-            print(f"[ERROR] Failed to load TXT {txt_file}: {e}")
+def iter_documents(data_dir: str, workers: Optional[int] = None,
+                   known: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[FileLoadResult]:
+    """
+    Load supported files in a process pool, yielding each file's result as soon as it is ready,
+    so chunking and embedding can start before the whole directory is loaded.
 
-    # CSV files
-    csv_files = list(data_path.glob('**/*.csv'))
-    print(f"[DEBUG] Found {len(csv_files)} CSV files: {[str(f) for f in csv_files]}")
-    for csv_file in csv_files:
-        print(f"[DEBUG] Loading CSV: {csv_file}")
-        try:
-            loader = CSVLoader(str(csv_file))
-            loaded = loader.load()
-            print(f"[DEBUG] Loaded {len(loaded)} CSV docs from {csv_file}")
-            documents.extend(loaded)
-        except Exception as e:
-            print(f"[ERROR] Failed to load CSV {csv_file}: {e}")
+    known is a file manifest such as MetadataStore.files(); files whose mtime and size match
+    their entry are skipped. Nothing is recorded here: the caller records a file once its
+    chunks are indexed (FaissVectorStore does), so a file that fails later is loaded again.
+    """
+    files = find_files(data_dir)
+    pending = files
+    if known is not None:
+        pending = []
+        for path in files:
+            stat = os.stat(path)
+            entry = known.get(path)
+            if not entry or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                pending.append(path)
+        print(f"[INFO] {len(files) - len(pending)} of {len(files)} files unchanged since the last load")
+    yield from load_files(pending, workers)
 
-    # Excel files
-    xlsx_files = list(data_path.glob('**/*.xlsx'))
-    print(f"[DEBUG] Found {len(xlsx_files)} Excel files: {[str(f) for f in xlsx_files]}")
-    for xlsx_file in xlsx_files:
-        print(f"[DEBUG] Loading Excel: {xlsx_file}")
-        try:
-            loader = UnstructuredExcelLoader(str(xlsx_file))
-            loaded = loader.load()
-            print(f"[DEBUG] Loaded {len(loaded)} Excel docs from {xlsx_file}")
-            documents.extend(loaded)
-        except Exception as e:
-            print(f"[ERROR] Failed to load Excel {xlsx_file}: {e}")
+def load_files(paths: List[str], workers: Optional[int] = None) -> Iterator[FileLoadResult]:
+    """Load the given files in a process pool, yielding results in completion order.
 
-    # Word files
-    docx_files = list(data_path.glob('**/*.docx'))
-    print(f"[DEBUG] Found {len(docx_files)} Word files: {[str(f) for f in docx_files]}")
-    for docx_file in docx_files:
-        print(f"[DEBUG] Loading Word: {docx_file}")
-        try:
-            loader = Docx2txtLoader(str(docx_file))
-            loaded = loader.load()
-            print(f"[DEBUG] Loaded {len(loaded)} Word docs from {docx_file}")
-            documents.extend(loaded)
-        except Exception as e:
-            print(f"[ERROR] Failed to load Word {docx_file}: {e}")
+    Closing the iterator early cancels the files not yet started instead of waiting for them.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield _load_file(path)
+        return
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(paths)))
+    try:
+        futures = {pool.submit(_load_file, path): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker itself died, e.g. a loader crashed the interpreter
+                yield FileLoadResult(path, error=f"{type(e).__name__}: {e}")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    # JSON files
-    json_files = list(data_path.glob('**/*.json'))
-    print(f"[DEBUG] Found {len(json_files)} JSON files: {[str(f) for f in json_files]}")
-    for json_file in json_files:
-        print(f"[DEBUG] Loading JSON: {json_file}")
-        try:
-            loader = JSONLoader(str(json_file))
-            loaded = loader.load()
-            print(f"[DEBUG] Loaded {len(loaded)} JSON docs from {json_file}")
-            documents.extend(loaded)
-        except Exception as e:
-            print(f"[ERROR] Failed to load JSON {json_file}: {e}")
+def load_all_documents(data_dir: str, workers: Optional[int] = None,
+                       known: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Any]:
+    """
+    Load all supported files from the data directory and convert to LangChain document structure.
+    Supported: PDF, TXT, CSV, Excel, Word, JSON
+    """
+    start = time.perf_counter()
+    documents = []
+    results = []
+    for result in iter_documents(data_dir, workers, known):
+        results.append(result)
+        if result.error:
+            print(f"[ERROR] Failed to load {result.path}: {result.error}")
+        else:
+            documents.extend(result.documents)
 
-    print(f"[DEBUG] Total loaded documents: {len(documents)}")
+    failed = sum(1 for result in results if result.error)
+    print(f"[INFO] Loaded {len(documents)} documents from {len(results) - failed} files "
+          f"({failed} failed) in {time.perf_counter() - start:.1f}s")
+    for result in sorted(results, key=lambda r: r.seconds, reverse=True)[:5]:
+        print(f"[INFO]   {result.seconds:.2f}s {result.path}")
     return documents
 
 # Example usage
 if __name__ == "__main__":
     docs = load_all_documents("data")
     print(f"Loaded {len(docs)} documents.")
-    print("Example document:", docs[0] if docs else None)
\ No newline at end of file
+    print("Example document:", docs[0] if docs else None)
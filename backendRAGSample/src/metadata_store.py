@@ -0,0 +1,168 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+class MetadataStore:
+    """Chunk metadata in SQLite, keyed by FAISS vector id.
+
+    Replaces the pickled list of dicts: nothing is read at startup and a
+    search only fetches the rows of the ids it returns. Also holds the file
+    manifest used for incremental updates (each source file's hash and the
+    range of vector ids its chunks were given) and the ids deleted from
+    indexes that cannot remove vectors in place.
+
+    Writes are not committed as they are made: they stay in one open
+    transaction until commit(), which FaissVectorStore.save() calls once
+    the matching index file is written, so a crash in between leaves the
+    last saved metadata behind rather than rows the saved index lacks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, text TEXT, extra TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, sha256 TEXT, mtime REAL, size INTEGER, "
+            "first_id INTEGER, last_id INTEGER)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS deleted (id INTEGER PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    @property
+    def empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None
+
+    def add(self, ids: Iterable[int], metadatas: Iterable[Dict[str, Any]]):
+        """Store metadata rows; existing ids are overwritten"""
+        rows = []
+        for vector_id, meta in zip(ids, metadatas):
+            meta = dict(meta or {})
+            text = meta.pop("text", None)
+            rows.append((int(vector_id), text, json.dumps(meta) if meta else None))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, text, extra) VALUES (?, ?, ?)", rows)
+
+    def get_many(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Metadata for the given ids; ids without a row are left out"""
+        found = {}
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for i in range(0, len(ids), _SQL_BATCH):
+                batch = ids[i:i + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT id, text, extra FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for vector_id, text, extra in rows:
+                    meta = json.loads(extra) if extra else {}
+                    if text is not None:
+                        meta["text"] = text
+                    found[vector_id] = meta
+        return found
+
+    def get(self, vector_id: int) -> Optional[Dict[str, Any]]:
+        return self.get_many([vector_id]).get(int(vector_id))
+
+    def delete(self, ids: List[int]):
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for i in range(0, len(ids), _SQL_BATCH):
+                batch = ids[i:i + _SQL_BATCH]
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+    def max_id(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute("SELECT MAX(id) FROM chunks").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM deleted")
+
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        """The file manifest: path -> sha256, mtime, size and the first/last vector id of its chunks"""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, sha256, mtime, size, first_id, last_id FROM files").fetchall()
+        return {
+            path: {"sha256": sha256, "mtime": mtime, "size": size, "first_id": first_id, "last_id": last_id}
+            for path, sha256, mtime, size, first_id, last_id in rows
+        }
+
+    def put_files(self, files: Dict[str, Dict[str, Any]]):
+        rows = [
+            (path, f["sha256"], f["mtime"], f["size"], f.get("first_id"), f.get("last_id"))
+            for path, f in files.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, sha256, mtime, size, first_id, last_id) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def delete_files(self, paths: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def deleted_ids(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM deleted")]
+
+    def add_deleted(self, ids: List[int]):
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO deleted (id) VALUES (?)", [(int(i),) for i in ids])
+
+    def clear_deleted(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM deleted")
+
+    def generation(self) -> int:
+        """Number of the last committed save; 0 before the first one"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def commit(self, generation: Optional[int] = None):
+        """Commit all pending writes, recording the save they belong to"""
+        with self._lock:
+            if generation is not None:
+                self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('generation', ?)", (generation,))
+            self._conn.commit()
+
+    def rollback(self):
+        """Discard writes made since the last commit"""
+        with self._lock:
+            self._conn.rollback()
+
+    def import_pickle(self, pickle_path: str, batch_size: int = 10_000) -> int:
+        """Migrate a metadata.pkl list, whose positions are the vector ids; returns the row count"""
+        with open(pickle_path, "rb") as f:
+            metadata = pickle.load(f)
+        for start in range(0, len(metadata), batch_size):
+            batch = metadata[start:start + batch_size]
+            self.add(range(start, start + len(batch)), batch)
+        self.commit()
+        print(f"[INFO] Migrated {len(metadata)} metadata rows from {pickle_path} to {self.path}")
+        return len(metadata)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
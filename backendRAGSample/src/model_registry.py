@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+# "torch" is the stock model; the others trade a little accuracy for faster CPU encoding.
+# ONNX backends need sentence-transformers >= 3.2 with optimum[onnxruntime] installed.
+BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+class _Entry:
+    """
+    One model name, device and backend, with up to `replicas` loaded copies. Fast tokenizers
+    raise "Already borrowed" when one model encodes from several threads, so each encode
+    borrows a copy of its own: with one replica encodes run one at a time, with n up to n
+    run in parallel, at the memory cost of n models. Copies beyond the first load on demand.
+    """
+
+    def __init__(self, model_name: str, device: str, backend: str, replicas: int = 1):
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.replicas = replicas
+        self.model = None
+        self.load_lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._loaded = 0
+
+    def _load_replica(self):
+        start = time.perf_counter()
+        model = _load(self.model_name, self.device, self.backend)
+        print(f"[INFO] Loaded embedding model: {self.model_name} ({self.backend}, {self.device}) "
+              f"in {time.perf_counter() - start:.1f}s")
+        return model
+
+    def load(self):
+        if self.model is not None:
+            return self.model
+        with self.load_lock:
+            if self.model is None:
+                self.model = self._load_replica()
+                self._loaded = 1
+                self._idle.put(self.model)
+        return self.model
+
+    @contextmanager
+    def borrow(self):
+        """A replica no other thread is encoding with"""
+        self.load()
+        try:
+            model = self._idle.get_nowait()
+        except queue.Empty:
+            with self.load_lock:
+                grow = self._loaded < self.replicas
+                if grow:
+                    self._loaded += 1
+            if grow:
+                try:
+                    model = self._load_replica()
+                except Exception:
+                    with self.load_lock:
+                        self._loaded -= 1
+                    raise
+            else:
+                model = self._idle.get()
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+_entries: Dict[Tuple[str, str, str], _Entry] = {}
+_entries_lock = threading.Lock()
+
+def _load(model_name: str, device: str, backend: str):
+    from sentence_transformers import SentenceTransformer
+    if backend in ("onnx", "onnx_int8"):
+        model_kwargs = {"file_name": ONNX_INT8_FILE} if backend == "onnx_int8" else None
+        try:
+            return SentenceTransformer(model_name, device=device, backend="onnx", model_kwargs=model_kwargs)
+        except Exception as e:
+            print(f"[WARNING] Could not load {model_name} with the ONNX backend ({e}), using torch")
+            return SentenceTransformer(model_name, device=device)
+    model = SentenceTransformer(model_name, device=device)
+    if backend == "torch_int8":
+        if device != "cpu":
+            print(f"[WARNING] int8 dynamic quantization is CPU only, using float {model_name} on {device}")
+            return model
+        import torch
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+def _entry(model_name: str, device: str, backend: str, replicas: int = 1) -> _Entry:
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
+    if replicas < 1:
+        raise ValueError(f"replicas must be at least 1, got {replicas}")
+    key = (model_name, device, backend)
+    with _entries_lock:
+        if key not in _entries:
+            _entries[key] = _Entry(model_name, device, backend, replicas)
+        entry = _entries[key]
+        # Handles sharing a model get the largest pool any of them asked for
+        entry.replicas = max(entry.replicas, replicas)
+        return entry
+
+def get_model(model_name: str, device: str = "cpu", backend: str = "torch"):
+    """The process-wide SentenceTransformer for this name, device and backend, loaded on first call"""
+    return _entry(model_name, device, backend).load()
+
+def loaded_models() -> List[Tuple[str, str, str]]:
+    with _entries_lock:
+        return [key for key, entry in _entries.items() if entry.model is not None]
+
+class EmbeddingModel:
+    """
+    Handle to a shared SentenceTransformer. Creating one is free: the model is loaded by the
+    first encode() and shared by every handle with the same name, device and backend.
+    replicas bounds how many encodes of the model run at once (see _Entry).
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", backend: str = "torch", replicas: int = 1):
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self._entry = _entry(model_name, device, backend, replicas)
+
+    def encode(self, texts: List[str], **kwargs: Any):
+        with self._entry.borrow() as model:
+            return model.encode(texts, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._entry.load().get_sentence_embedding_dimension()
@@ -6,17 +6,21 @@ from langchain_groq import ChatGroq
 load_dotenv()
 
 class RAGSearch:
-    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", llm_model: str = "llama-3.1-8b-instant"):
-        self.vectorstore = FaissVectorStore(persist_dir, embedding_model)
-        # Load or build vectorstore
-        faiss_path = os.path.join(persist_dir, "faiss.index")
-        meta_path = os.path.join(persist_dir, "metadata.pkl")
-        if not (os.path.exists(faiss_path) and os.path.exists(meta_path)):
+    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", llm_model: str = "llama-3.1-8b-instant",
+                 data_dir: str = "data", incremental: bool = False, quantization: str = "none",
+                 device: str = "cpu", embedding_backend: str = "torch", embedding_replicas: int = 1):
+        # quantization only applies when the index is built; a saved index keeps its own
+        self.vectorstore = FaissVectorStore(persist_dir, embedding_model, quantization=quantization,
+                                            device=device, embedding_backend=embedding_backend,
+                                            embedding_replicas=embedding_replicas)
+        # Load or build vectorstore; incremental mode also applies files added, changed or deleted since the last run
+        if incremental:
+            self.vectorstore.load()
+            self.vectorstore.update_from_directory(data_dir)
+        elif not self.vectorstore.load():
             from data_loader import load_all_documents
-            docs = load_all_documents("data")
+            docs = load_all_documents(data_dir)
             self.vectorstore.build_from_documents(docs)
-        else:
-            self.vectorstore.load()
         groq_api_key = os.getenv("GROQ_API_KEY")
         self.llm = ChatGroq(groq_api_key=groq_api_key, model_name=llm_model)
         print(f"[INFO] Groq LLM initialized: {llm_model}")
@@ -0,0 +1,53 @@
+import os
+import threading
+import numpy as np
+
+class VectorFile:
+    """Full-precision float32 vectors on disk, one row per vector id.
+
+    Kept alongside quantized indexes so the top candidates of a search can
+    be rescored exactly. Rows are read through a memory map, so only the
+    pages of the rows a search touches are loaded; ids are never reused, so
+    rows of removed vectors are simply left unread.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self._row_bytes = 4 * dim
+        self._lock = threading.Lock()
+        self._mmap = None
+        if not os.path.exists(path):
+            open(path, "wb").close()
+
+    @property
+    def rows(self) -> int:
+        return os.path.getsize(self.path) // self._row_bytes
+
+    def write(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype='int64')
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        order = np.argsort(ids)
+        ids, vectors = ids[order], vectors[order]
+        # Write each run of consecutive ids with a single seek
+        breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+        with self._lock, open(self.path, "r+b") as f:
+            for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(ids)]):
+                f.seek(int(ids[start]) * self._row_bytes)
+                f.write(vectors[start:end].tobytes())
+            self._mmap = None
+
+    def read(self, ids: np.ndarray) -> np.ndarray:
+        """Vectors for the given ids, in the same order"""
+        if not len(ids):
+            return np.empty((0, self.dim), dtype='float32')
+        with self._lock:
+            if self._mmap is None or len(self._mmap) != self.rows:
+                self._mmap = np.memmap(self.path, dtype='float32', mode='r', shape=(self.rows, self.dim))
+            return np.array(self._mmap[np.asarray(ids, dtype='int64')])
+
+    def remove(self):
+        with self._lock:
+            self._mmap = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
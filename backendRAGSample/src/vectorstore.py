@@ -1,76 +1,592 @@
 import os
+import json
+import time
 import faiss
 import numpy as np
-import pickle
-from typing import List, Any
-from sentence_transformers import SentenceTransformer
+from typing import Dict, Iterable, List, Any, Optional
+from src.data_loader import file_sha256, find_files, load_files
 from src.embedding import EmbeddingPipeline
+from src.metadata_store import MetadataStore
+from src.model_registry import EmbeddingModel
+from src.vector_file import VectorFile
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+QUANTIZATIONS = ("none", "sq_fp16", "sq_int8", "pq")
+
+def default_nlist(n_vectors: int) -> int:
+    """IVF list count: about 4 * sqrt(n), with enough points per list to train"""
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+
+def default_pq_m(dim: int) -> int:
+    """Number of PQ sub-quantizers: the largest common choice that divides dim"""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if m <= dim // 2 and dim % m == 0:
+            return m
+    return 1
+
+def build_index(embeddings: np.ndarray, index_type: str = "flat", nlist: Optional[int] = None,
+                pq_m: Optional[int] = None, pq_bits: int = 8, hnsw_m: int = 32, ef_construction: int = 200,
+                train_sample_size: int = 100_000, quantization: str = "none"):
+    """Create an empty index of the given type, trained on a sample of embeddings.
+
+    quantization picks how flat, IVF-Flat and HNSW indexes store vectors:
+    float32 ("none"), float16 or int8 scalar quantization (2x and 4x smaller),
+    or product quantization ("pq"). IVF-PQ always stores PQ codes.
+
+    Vectors are added with explicit, stable ids (add_with_ids): flat and HNSW
+    indexes are wrapped in an IndexIDMap2, IVF indexes store ids in their
+    lists and get a hashtable direct map so ids can be removed and reconstructed.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"quantization must be one of {QUANTIZATIONS}, got {quantization!r}")
+    n, dim = embeddings.shape
+    if quantization == "pq" and n < 39 * (1 << pq_bits):
+        print(f"[WARNING] {n} vectors are too few to train PQ, using int8 scalar quantization")
+        quantization = "sq_int8"
+    if index_type == "ivf_pq" and n < 39 * (1 << pq_bits):
+        # PQ codebooks need ~39 points per centroid to train
+        print(f"[WARNING] {n} vectors are too few to train IVF-PQ, using IVF-Flat")
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and n < 39:
+        print(f"[WARNING] {n} vectors are too few to train IVF, using a flat index")
+        index_type = "flat"
+
+    storage = {
+        "none": "Flat", "sq_fp16": "SQfp16", "sq_int8": "SQ8", "pq": f"PQ{pq_m or default_pq_m(dim)}x{pq_bits}"
+    }[quantization]
+    if index_type == "flat":
+        factory = f"IDMap2,{storage}"
+    elif index_type == "ivf_flat":
+        factory = f"IVF{nlist or default_nlist(n)},{storage}"
+    elif index_type == "ivf_pq":
+        factory = f"IVF{nlist or default_nlist(n)},PQ{pq_m or default_pq_m(dim)}x{pq_bits}"
+    else:
+        factory = f"IDMap2,HNSW{hnsw_m},{storage}"
+
+    index = faiss.index_factory(dim, factory)
+    if index_type == "hnsw":
+        base_index(index).hnsw.efConstruction = ef_construction
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+    if not index.is_trained:
+        sample = embeddings
+        if n > train_sample_size:
+            rows = np.random.default_rng(0).choice(n, train_sample_size, replace=False)
+            sample = embeddings[np.sort(rows)]
+        start = time.perf_counter()
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+        print(f"[INFO] Trained {factory} index on {len(sample)} vectors in {time.perf_counter() - start:.1f}s")
+    return index
+
+def rescore(query_embeddings: np.ndarray, candidate_ids: np.ndarray, lookup, top_k: int):
+    """
+    Re-rank each query's candidate ids by exact squared L2 distance to their float32 vectors,
+    fetched with lookup(ids). Returns (distances, ids) shaped like Index.search, padded with -1.
+    """
+    n = len(query_embeddings)
+    distances = np.full((n, top_k), np.inf, dtype='float32')
+    ids = np.full((n, top_k), -1, dtype='int64')
+    unique = np.unique(candidate_ids[candidate_ids >= 0])
+    vectors = lookup(unique)
+    for q, candidates in enumerate(candidate_ids):
+        candidates = candidates[candidates >= 0]
+        if not len(candidates):
+            continue
+        diff = vectors[np.searchsorted(unique, candidates)] - query_embeddings[q]
+        exact = np.einsum('ij,ij->i', diff, diff)
+        order = np.argsort(exact, kind='stable')[:top_k]
+        distances[q, :len(order)] = exact[order]
+        ids[q, :len(order)] = candidates[order]
+    return distances, ids
+
+def base_index(index):
+    """The index inside an IndexIDMap wrapper, or the index itself"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def search_parameters(index, nprobe: int, ef_search: int, sel=None):
+    """Per-call search parameters for IVF (nprobe) and HNSW (efSearch) indexes, None for exact ones.
+
+    sel, a faiss IDSelector, restricts the ids a search may return.
+    """
+    if isinstance(base_index(index), faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search, sel=sel)
+    try:
+        faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return faiss.SearchParameters(sel=sel) if sel is not None else None
+    return faiss.SearchParametersIVF(nprobe=nprobe, sel=sel)
 
 class FaissVectorStore:
-    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", chunk_size: int = 1000, chunk_overlap: int = 200,
+                 index_type: str = "flat", nlist: Optional[int] = None, pq_m: Optional[int] = None, pq_bits: int = 8,
+                 hnsw_m: int = 32, ef_construction: int = 200, nprobe: int = 16, ef_search: int = 64,
+                 train_sample_size: int = 100_000, compact_ratio: float = 0.2, quantization: str = "none",
+                 rescore_factor: int = 4, device: str = "cpu", embedding_backend: str = "torch",
+                 embedding_replicas: int = 1):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}, got {quantization!r}")
         self.persist_dir = persist_dir
         os.makedirs(self.persist_dir, exist_ok=True)
         self.index = None
-        self.metadata = []
+        self.metadata_store = MetadataStore(os.path.join(self.persist_dir, "metadata.sqlite3"))
         self.embedding_model = embedding_model
-        self.model = SentenceTransformer(embedding_model)
+        self.device = device
+        self.embedding_backend = embedding_backend
+        # Concurrent queries encode in parallel on up to embedding_replicas copies of the model
+        self.embedding_replicas = embedding_replicas
+        self.model = EmbeddingModel(embedding_model, device=device, backend=embedding_backend, replicas=embedding_replicas)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        print(f"[INFO] Loaded embedding model: {embedding_model}")
+        # Index construction; only used when a new index is built
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.train_sample_size = train_sample_size
+        self.quantization = quantization
+        # Lossy indexes keep float32 vectors on disk; searches fetch rescore_factor * top_k
+        # candidates and rank them by exact distance (a factor of 1 turns rescoring off)
+        self.vector_file = None
+        self.rescore_factor = rescore_factor
+        # Query-time defaults, overridable per search
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.mmapped = False
+        # Incremental updates: ids are never reused, and compaction runs once
+        # stale_fraction() reaches compact_ratio
+        self.next_id = 0
+        self.churn = 0
+        self.compact_ratio = compact_ratio
+        self._set_deleted([])
 
     def build_from_documents(self, documents: List[Any]):
         print(f"[INFO] Building vector store from {len(documents)} raw documents...")
-        emb_pipe = EmbeddingPipeline(model_name=self.embedding_model, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
-        chunks = emb_pipe.chunk_documents(documents)
-        embeddings = emb_pipe.embed_chunks(chunks)
-        metadatas = [{"text": chunk.page_content} for chunk in chunks]
-        self.add_embeddings(np.array(embeddings).astype('float32'), metadatas)
+        self._add_documents(documents)
         self.save()
         print(f"[INFO] Vector store built and saved to {self.persist_dir}")
 
-    def add_embeddings(self, embeddings: np.ndarray, metadatas: List[Any] = None):
-        dim = embeddings.shape[1]
+    def _add_documents(self, documents: List[Any], digests: Optional[Dict[str, str]] = None) -> int:
+        """Chunk, embed and add documents, recording each source file in the manifest; returns the vector count"""
+        emb_pipe = EmbeddingPipeline(model_name=self.embedding_model, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap,
+                                     device=self.device, backend=self.embedding_backend)
+        chunks = emb_pipe.chunk_documents(documents)
+        if not chunks:
+            return 0
+        # Keep each file's chunks together so they get a contiguous id range
+        chunks.sort(key=lambda chunk: str(chunk.metadata.get("source", "")))
+        embeddings = emb_pipe.embed_chunks(chunks)
+        sources = [chunk.metadata.get("source") for chunk in chunks]
+        metadatas = [{"text": chunk.page_content, "source": source} for chunk, source in zip(chunks, sources)]
+        ids = self.add_embeddings(np.array(embeddings).astype('float32'), metadatas)
+        self._record_files(sources, ids, digests or {})
+        return len(ids)
+
+    def _record_files(self, sources: List[Optional[str]], ids: List[int], digests: Dict[str, str]):
+        ranges = {}
+        for source, vector_id in zip(sources, ids):
+            if source is None:
+                continue
+            first, last = ranges.get(source, (vector_id, vector_id))
+            ranges[source] = (min(first, vector_id), max(last, vector_id))
+        files = {}
+        for path, (first, last) in ranges.items():
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files[path] = {
+                "sha256": digests.get(path) or file_sha256(path), "mtime": stat.st_mtime, "size": stat.st_size,
+                "first_id": int(first), "last_id": int(last)
+            }
+        self.metadata_store.put_files(files)
+
+    def add_embeddings(self, embeddings: np.ndarray, metadatas: List[Any] = None) -> List[int]:
+        """Add vectors under newly allocated ids, which are returned"""
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
         if self.index is None:
-            self.index = faiss.IndexFlatL2(dim)
-        self.index.add(embeddings)
+            # New index: rows left from an earlier build would shadow the new ids
+            self.reset()
+            self.index = self._build_index(embeddings)
+            if self.quantization != "none" or self.index_type == "ivf_pq":
+                # Written beside the saved one, which the saved index still needs until save() swaps them
+                self.vector_file = VectorFile(self._staged_path(self._vector_file_path()), embeddings.shape[1])
+        else:
+            self._make_writable()
+            self.churn += embeddings.shape[0]
+        ids = np.arange(self.next_id, self.next_id + embeddings.shape[0], dtype='int64')
+        self.index.add_with_ids(embeddings, ids)
+        if self.vector_file is not None:
+            self.vector_file.write(ids, embeddings)
+        self.next_id += len(ids)
         if metadatas:
-            self.metadata.extend(metadatas)
+            self.metadata_store.add(ids, metadatas)
         print(f"[INFO] Added {embeddings.shape[0]} vectors to Faiss index.")
+        return ids.tolist()
+
+    def remove_ids(self, ids: Iterable[int]) -> int:
+        """Remove vectors by id; returns the number removed"""
+        ids = np.asarray(list(ids), dtype='int64')
+        if self.index is None or not len(ids):
+            return 0
+        self._make_writable()
+        if isinstance(base_index(self.index), faiss.IndexHNSW):
+            # HNSW graphs cannot drop nodes; hide them from searches until the next compaction
+            self.metadata_store.add_deleted(ids)
+            self._set_deleted(self.metadata_store.deleted_ids())
+            removed = len(ids)
+        else:
+            removed = self.index.remove_ids(ids)
+            self.churn += removed
+        self.metadata_store.delete(ids)
+        return removed
+
+    def remove_files(self, paths: List[str], known: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+        """Remove the vectors of the given source files and forget them; returns the number of vectors removed"""
+        known = known if known is not None else self.metadata_store.files()
+        ids = []
+        for path in paths:
+            entry = known.get(path)
+            if entry and entry["first_id"] is not None:
+                ids.extend(range(entry["first_id"], entry["last_id"] + 1))
+        removed = self.remove_ids(ids)
+        self.metadata_store.delete_files(paths)
+        return removed
+
+    def update_from_directory(self, data_dir: str, workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring the index in line with data_dir without rebuilding it: new and modified files are
+        loaded, embedded and added, the vectors of modified and deleted files are removed, and
+        unchanged files are not read. Files are compared by mtime and size, and by content hash
+        only when those differ. The index is compacted once stale_fraction() reaches compact_ratio.
+        """
+        start = time.perf_counter()
+        known = self.metadata_store.files()
+        if self.index is not None and self.index.ntotal and not known:
+            print(f"[WARNING] Index in {self.persist_dir} has no file manifest; rebuilding it from {data_dir}")
+            self.reset()
+
+        paths = find_files(data_dir)
+        changed, touched = {}, {}
+        for path in paths:
+            stat = os.stat(path)
+            entry = known.get(path)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            digest = file_sha256(path)
+            if entry and entry["sha256"] == digest:
+                touched[path] = {**entry, "mtime": stat.st_mtime, "size": stat.st_size}
+            else:
+                changed[path] = digest
+        present = set(paths)
+        removed = [path for path in known if path not in present]
+        modified = [path for path in changed if path in known]
+        vectors_removed = self.remove_files(removed + modified, known)
+
+        documents, loaded, failed = [], [], 0
+        for result in load_files(list(changed), workers):
+            if result.error:
+                print(f"[ERROR] Failed to load {result.path}: {result.error}")
+                failed += 1
+                continue
+            for document in result.documents:
+                document.metadata["source"] = result.path
+            documents.extend(result.documents)
+            loaded.append(result.path)
+        vectors_added = self._add_documents(documents, changed) if documents else 0
+        # Files that produced no chunks are still recorded, so they are not reloaded every run
+        recorded = self.metadata_store.files()
+        for path in loaded:
+            if path not in recorded:
+                stat = os.stat(path)
+                touched[path] = {"sha256": changed[path], "mtime": stat.st_mtime, "size": stat.st_size}
+        self.metadata_store.put_files(touched)
+
+        compacted = False
+        if self.stale_fraction() >= self.compact_ratio:
+            self.compact()
+            compacted = True
+        if self.index is not None and (vectors_added or vectors_removed or compacted):
+            self.save()
+        else:
+            self.metadata_store.commit()
+
+        summary = {
+            "added": len(changed) - len(modified),
+            "modified": len(modified),
+            "removed": len(removed),
+            "unchanged": len(paths) - len(changed),
+            "failed": failed,
+            "vectors_added": vectors_added,
+            "vectors_removed": vectors_removed,
+            "compacted": compacted
+        }
+        print(f"[INFO] Updated index from {data_dir} in {time.perf_counter() - start:.1f}s: {summary}")
+        return summary
+
+    def stale_fraction(self) -> float:
+        """Share of the index a compaction would clean up: hidden HNSW vectors, or IVF vectors added or removed since training"""
+        if self.index is None or not self.index.ntotal:
+            return 0.0
+        if isinstance(base_index(self.index), faiss.IndexHNSW):
+            return len(self._deleted) / self.index.ntotal
+        try:
+            faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            # Flat indexes remove vectors in place and have nothing to retrain
+            return 0.0
+        return self.churn / self.index.ntotal
+
+    def compact(self):
+        """
+        Rebuild the index from its live vectors under the same ids, dropping hidden HNSW vectors
+        and retraining IVF centroids on the current corpus. Quantized indexes are rebuilt from
+        their float32 vector file when they have one, otherwise from their compressed codes.
+        """
+        if self.index is None:
+            return
+        start = time.perf_counter()
+        self._make_writable()
+        ids = self._live_ids()
+        if not len(ids):
+            self.reset()
+            return
+        vectors = self.vector_file.read(ids) if self.vector_file is not None else self.index.reconstruct_batch(ids)
+        index = self._build_index(vectors)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        self.metadata_store.clear_deleted()
+        self._set_deleted([])
+        self.churn = 0
+        print(f"[INFO] Compacted Faiss index to {len(ids)} vectors in {time.perf_counter() - start:.1f}s")
+
+    def _build_index(self, embeddings: np.ndarray):
+        return build_index(
+            embeddings, self.index_type, nlist=self.nlist, pq_m=self.pq_m, pq_bits=self.pq_bits,
+            hnsw_m=self.hnsw_m, ef_construction=self.ef_construction, train_sample_size=self.train_sample_size,
+            quantization=self.quantization
+        )
+
+    def _vector_file_path(self) -> str:
+        return os.path.join(self.persist_dir, "vectors.f32")
+
+    @staticmethod
+    def _staged_path(path: str) -> str:
+        return f"{path}.new"
+
+    def _live_ids(self) -> np.ndarray:
+        if isinstance(self.index, faiss.IndexIDMap):
+            ids = faiss.vector_to_array(self.index.id_map)
+            if self._deleted:
+                ids = ids[~np.isin(ids, np.fromiter(self._deleted, dtype='int64'))]
+            return ids
+        invlists = faiss.extract_index_ivf(self.index).invlists
+        return np.concatenate([
+            faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+            for i in range(invlists.nlist)
+        ] + [np.empty(0, dtype='int64')])
+
+    def reset(self):
+        """Drop the index and all metadata; the saved files are only replaced by the next save()"""
+        self.index = None
+        self.mmapped = False
+        self.metadata_store.clear()
+        if self.vector_file is not None and self.vector_file.path != self._vector_file_path():
+            self.vector_file.remove()
+        self.vector_file = None
+        staged = self._staged_path(self._vector_file_path())
+        if os.path.exists(staged):
+            os.remove(staged)
+        self._set_deleted([])
+        self.next_id = 0
+        self.churn = 0
+
+    def _set_deleted(self, ids: Iterable[int]):
+        self._deleted = set(ids)
+        self._deleted_selector = None
+        if self._deleted:
+            batch = faiss.IDSelectorBatch(np.fromiter(self._deleted, dtype='int64'))
+            # Keep the inner selector referenced; faiss does not own it
+            self._deleted_selector = (batch, faiss.IDSelectorNot(batch))
+
+    def _make_writable(self):
+        if self.mmapped:
+            # Memory-mapped indexes are read-only; load a writable copy first
+            self.index = faiss.read_index(os.path.join(self.persist_dir, "faiss.index"))
+            self.mmapped = False
+        if isinstance(self.index, faiss.IndexIDMap):
+            return
+        # Indexes saved before stable ids used positions as ids
+        try:
+            ivf = faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            ivf = None
+        if ivf is not None:
+            # IVF lists already hold the positions as ids; the direct map allows removal and reconstruction
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        inner = faiss.clone_index(self.index)
+        inner.reset()
+        self.index = faiss.IndexIDMap2(inner)
+        self.index.add_with_ids(vectors, np.arange(len(vectors), dtype='int64'))
 
     def save(self):
+        """
+        Save the index together with the metadata written since the last save. The index,
+        its config and a rebuilt float32 vector file are staged next to the saved ones, the
+        metadata transaction is committed with the new generation, and the staged files are
+        then moved into place; load() finishes or discards a save that stopped part way.
+        """
         faiss_path = os.path.join(self.persist_dir, "faiss.index")
-        meta_path = os.path.join(self.persist_dir, "metadata.pkl")
-        faiss.write_index(self.index, faiss_path)
-        with open(meta_path, "wb") as f:
-            pickle.dump(self.metadata, f)
+        config_path = os.path.join(self.persist_dir, "index_config.json")
+        generation = self.metadata_store.generation() + 1
+        faiss.write_index(self.index, self._staged_path(faiss_path))
+        with open(self._staged_path(config_path), "w") as f:
+            json.dump({
+                "index_type": self.index_type, "quantization": self.quantization,
+                "float32_vectors": self.vector_file is not None, "nprobe": self.nprobe, "ef_search": self.ef_search,
+                "next_id": self.next_id, "churn": self.churn, "generation": generation,
+                "embedding_model": self.embedding_model, "embedding_backend": self.embedding_backend
+            }, f)
+        self.metadata_store.commit(generation)
+        self._install_staged()
+        if self.vector_file is not None:
+            self.vector_file = VectorFile(self._vector_file_path(), self.vector_file.dim)
         print(f"[INFO] Saved Faiss index and metadata to {self.persist_dir}")
 
-    def load(self):
+    def _install_staged(self):
+        """Move the files of a committed save into place"""
+        config_path = os.path.join(self.persist_dir, "index_config.json")
+        with open(self._staged_path(config_path)) as f:
+            float32_vectors = json.load(f).get("float32_vectors")
+        vector_path = self._vector_file_path()
+        if os.path.exists(self._staged_path(vector_path)):
+            os.replace(self._staged_path(vector_path), vector_path)
+        elif not float32_vectors and os.path.exists(vector_path):
+            os.remove(vector_path)
         faiss_path = os.path.join(self.persist_dir, "faiss.index")
-        meta_path = os.path.join(self.persist_dir, "metadata.pkl")
+        if os.path.exists(self._staged_path(faiss_path)):
+            os.replace(self._staged_path(faiss_path), faiss_path)
+        # The config goes last: while it is staged, load() knows the save is unfinished
+        os.replace(self._staged_path(config_path), config_path)
+
+    def _recover_save(self):
+        """Finish a save that committed its metadata but stopped before its files were moved, or discard one that did not"""
+        config_path = os.path.join(self.persist_dir, "index_config.json")
+        staged = [self._staged_path(path) for path in
+                  (os.path.join(self.persist_dir, "faiss.index"), self._vector_file_path(), config_path)]
+        if not any(os.path.exists(path) for path in staged):
+            return
+        try:
+            with open(self._staged_path(config_path)) as f:
+                committed = json.load(f).get("generation") == self.metadata_store.generation()
+        except (OSError, ValueError):
+            committed = False
+        if committed:
+            print(f"[WARNING] Completing an interrupted save in {self.persist_dir}")
+            self._install_staged()
+            return
+        print(f"[WARNING] Discarding an interrupted save in {self.persist_dir}")
+        for path in staged:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load(self, mmap: bool = True):
+        """Load a saved index; with mmap the index file is paged in on demand instead of read up front"""
+        faiss_path = os.path.join(self.persist_dir, "faiss.index")
+        legacy_meta_path = os.path.join(self.persist_dir, "metadata.pkl")
+        self._recover_save()
+        has_metadata = not self.metadata_store.empty or os.path.exists(legacy_meta_path)
         
-        if not os.path.exists(faiss_path) or not os.path.exists(meta_path):
+        if not os.path.exists(faiss_path) or not has_metadata:
             print(f"[WARNING] Index files not found in {self.persist_dir}. Please build the index first.")
             return False
             
-        self.index = faiss.read_index(faiss_path)
-        with open(meta_path, "rb") as f:
-            self.metadata = pickle.load(f)
+        self.mmapped = False
+        if mmap:
+            try:
+                self.index = faiss.read_index(faiss_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self.mmapped = True
+            except RuntimeError as e:
+                print(f"[WARNING] Memory-mapped load failed ({e}), reading index into memory")
+        if not self.mmapped:
+            self.index = faiss.read_index(faiss_path)
+        config_path = os.path.join(self.persist_dir, "index_config.json")
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+            self.index_type = config.get("index_type", self.index_type)
+            self.quantization = config.get("quantization", self.quantization)
+            if config.get("float32_vectors") and os.path.exists(self._vector_file_path()):
+                self.vector_file = VectorFile(self._vector_file_path(), self.index.d)
+            self.nprobe = config.get("nprobe", self.nprobe)
+            self.ef_search = config.get("ef_search", self.ef_search)
+            self.next_id = config.get("next_id", 0)
+            self.churn = config.get("churn", 0)
+            # Queries must be embedded the way the index was built; the int8 backends move embeddings
+            embedding = (config.get("embedding_model", self.embedding_model),
+                         config.get("embedding_backend", self.embedding_backend))
+            if embedding != (self.embedding_model, self.embedding_backend):
+                print(f"[WARNING] Index in {self.persist_dir} was built with {embedding[0]} ({embedding[1]}), "
+                      f"not {self.embedding_model} ({self.embedding_backend}); using the index's model")
+                self.embedding_model, self.embedding_backend = embedding
+                self.model = EmbeddingModel(self.embedding_model, device=self.device, backend=self.embedding_backend,
+                                            replicas=self.embedding_replicas)
+        if self.metadata_store.empty:
+            # Stores saved before the SQLite metadata kept a pickled list
+            self.metadata_store.import_pickle(legacy_meta_path)
+        max_id = self.metadata_store.max_id()
+        self.next_id = max(self.next_id, self.index.ntotal, max_id + 1 if max_id is not None else 0)
+        self._set_deleted(self.metadata_store.deleted_ids())
         print(f"[INFO] Loaded Faiss index and metadata from {self.persist_dir}")
         return True
 
-    def search(self, query_embedding: np.ndarray, top_k: int = 5):
-        D, I = self.index.search(query_embedding, top_k)
-        results = []
-        for idx, dist in zip(I[0], D[0]):
-            meta = self.metadata[idx] if idx < len(self.metadata) else None
-            results.append({"index": idx, "distance": dist, "metadata": meta})
-        return results
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        return self.search_batch(query_embedding[:1], top_k=top_k, nprobe=nprobe, ef_search=ef_search)[0]
 
-    def query(self, query_text: str, top_k: int = 5):
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Search all query vectors in one index call; returns one result list per query"""
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        sel = self._deleted_selector[1] if self._deleted_selector else None
+        params = search_parameters(self.index, nprobe or self.nprobe, ef_search or self.ef_search, sel=sel)
+        rescoring = self.vector_file is not None and self.rescore_factor > 1
+        k = top_k * self.rescore_factor if rescoring else top_k
+        if params is not None:
+            D, I = self.index.search(query_embeddings, k, params=params)
+        else:
+            D, I = self.index.search(query_embeddings, k)
+        if rescoring:
+            D, I = rescore(query_embeddings, I, self.vector_file.read, top_k)
+        # Fewer than top_k vectors may be reachable with these search parameters
+        rows = self.metadata_store.get_many(sorted({int(idx) for idx in I.ravel() if idx >= 0}))
+        batch_results = []
+        for ids, distances in zip(I, D):
+            batch_results.append([
+                {"index": idx, "distance": dist, "metadata": rows.get(int(idx))}
+                for idx, dist in zip(ids, distances) if idx >= 0
+            ])
+        return batch_results
+
+    def query(self, query_text: str, top_k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
         print(f"[INFO] Querying vector store for: '{query_text}'")
         query_emb = self.model.encode([query_text]).astype('float32')
-        return self.search(query_emb, top_k=top_k)
+        return self.search(query_emb, top_k=top_k, nprobe=nprobe, ef_search=ef_search)
+
+    def query_batch(self, query_texts: List[str], top_k: int = 5, batch_size: int = 64,
+                    nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Encode all queries in one batched call and search them together"""
+        print(f"[INFO] Querying vector store for {len(query_texts)} queries")
+        if not query_texts:
+            return []
+        query_embs = self.model.encode(query_texts, batch_size=batch_size).astype('float32')
+        return self.search_batch(query_embs, top_k=top_k, nprobe=nprobe, ef_search=ef_search)
 
 # Example usage
 if __name__ == "__main__":